@@ -1,16 +1,855 @@
+import asyncio
+import argparse
+import csv
 import json
+import getpass
+import heapq
+import math
+import os
+import random
+import statistics
+import threading
+import time
+import traceback
+import weakref
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as calendar_date
+from contextlib import contextmanager
+from functools import wraps
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlsplit, parse_qs, unquote
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
+from tkinter import filedialog
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+TRANSACTION_COLUMNS = ['index', 'amount', 'currency', 'category', 'date', 'type', 'source']
+REPORT_COLUMNS = ['section', 'category', 'amount']
+EXPORT_FORMATS = {'csv': "CSV", 'jsonl': "JSON Lines", 'parquet': "Parquet"}
+EXPORT_CHUNK_SIZE = 10000
+LEDGER_POLL_INTERVAL_MS = 1000
+# Bursts of changes (e.g. an import) are coalesced into one repaint per interval
+REFRESH_DEBOUNCE_MS = 250
+DASHBOARD_RECENT_COUNT = 10
+DEFAULT_CURRENCY = 'USD'
+SAMPLE_SIZE_PER_MONTH = 256
+SKETCH_ACCURACY = 0.01
+TOP_SOURCES_CAPACITY = 64
+TOP_SOURCES_SHOWN = 5
+EXACT_POLL_INTERVAL_MS = 50
+ROW_STORE_PATH = 'transactions.rows'
+ROW_INDEX_PATH = 'transactions.index'
+# Transactions this many days apart or less with the same amount, source and type are possible duplicates
+DUPLICATE_WINDOW_DAYS = 3
+# Parquet column types as pyarrow type names, anything not listed is written as a string
+EXPORT_PARQUET_TYPES = {'index': 'int64', 'amount': 'float64'}
+
+
+def writes_ledger(method):
+    # Mutations hold the ledger lock from start to finish, and the lock first
+    # brings this instance up to date with whatever other instances wrote.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.ledger_lock():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def day_bounds(start_date, end_date):
+    # The first and last YYYY-MM-DD days iter_transactions keeps for these bounds.
+    # It compares each day's midnight, so a start later in the day skips that day.
+    first_day = start_date.strftime("%Y-%m-%d") if start_date else None
+    if start_date and start_date > start_date.replace(hour=0, minute=0, second=0, microsecond=0):
+        first_day = (start_date + timedelta(days=1)).strftime("%Y-%m-%d")
+    last_day = end_date.strftime("%Y-%m-%d") if end_date else None
+    return first_day, last_day
+
+
+class CategoryMatcher:
+    """Categorization rules compiled into a single Aho-Corasick automaton.
+
+    Each source is scanned once no matter how many rules there are. Of the
+    rules whose keyword occurs in the source and whose amount range fits,
+    the one listed first wins. A rule without a keyword matches on amount alone.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.keywordless = []
+        self.transitions = [{}]
+        self.failure = [0]
+        self.outputs = [[]]
+
+        for rule_id, rule in enumerate(rules):
+            keyword = rule['keyword'].casefold()
+            if not keyword:
+                self.keywordless.append(rule_id)
+                continue
+
+            state = 0
+            for character in keyword:
+                next_state = self.transitions[state].get(character)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions.append({})
+                    self.failure.append(0)
+                    self.outputs.append([])
+                    self.transitions[state][character] = next_state
+                state = next_state
+            self.outputs[state].append(rule_id)
+
+        # Breadth-first pass to link every state to its longest proper suffix
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.failure[state]
+                while fallback and character not in self.transitions[fallback]:
+                    fallback = self.failure[fallback]
+                self.failure[next_state] = self.transitions[fallback].get(character, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failure[next_state]]
+
+
+    def amount_fits(self, rule_id, amount):
+        rule = self.rules[rule_id]
+        if rule['min_amount'] is not None and amount < rule['min_amount']:
+            return False
+        if rule['max_amount'] is not None and amount > rule['max_amount']:
+            return False
+        return True
+
+
+    def match(self, source, amount):
+        transitions = self.transitions
+        failure = self.failure
+        outputs = self.outputs
+        best = None
+
+        state = 0
+        for character in str(source).casefold():
+            while state and character not in transitions[state]:
+                state = failure[state]
+            state = transitions[state].get(character, 0)
+            for rule_id in outputs[state]:
+                if (best is None or rule_id < best) and self.amount_fits(rule_id, amount):
+                    best = rule_id
+
+        for rule_id in self.keywordless:
+            if (best is None or rule_id < best) and self.amount_fits(rule_id, amount):
+                best = rule_id
+                break
+
+        return None if best is None else self.rules[best]['category']
+
+
+class QuantileSketch:
+    """Amount distribution kept as counts in log-spaced buckets.
+
+    Any quantile read back is within `accuracy` of a real amount, relative to
+    its size. Because buckets are plain counts, rows can be removed as well as
+    added, and sketches for different months merge by adding counts.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts = {}
+        self.count = 0
+
+    def add(self, amount, sign=1):
+        bucket = math.ceil(math.log(amount) / self.log_gamma) if amount > 0 else -math.inf
+        self.counts[bucket] = self.counts.get(bucket, 0) + sign
+        if not self.counts[bucket]:
+            del self.counts[bucket]
+        self.count += sign
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return 0.0 if bucket == -math.inf else 2 * self.gamma ** bucket / (self.gamma + 1)
+        return None
+
+
+class TopSources:
+    """Space-saving counter for the most frequent sources.
+
+    At most `capacity` sources are tracked. A new source takes over the
+    smallest counter. A source without a counter occurs at most `evicted`
+    times, the largest count ever given up, so a new counter inherits that as
+    error: a reported count is never too low and is too high by at most its
+    error, even after rows are removed.
+    """
+
+    def __init__(self, capacity=TOP_SOURCES_CAPACITY):
+        self.capacity = capacity
+        self.counters = {}
+        self.evicted = 0
+        # (count, source) min-heap; a count may trail its counter, which has grown since
+        self.heap = []
+
+    def add(self, source, sign=1):
+        counter = self.counters.get(source)
+        if counter is not None:
+            counter[0] += sign
+            if counter[0] <= 0:
+                del self.counters[source]
+            elif sign < 0:
+                self.push(counter[0], source)
+        elif sign > 0:
+            if len(self.counters) >= self.capacity:
+                self.evicted = max(self.evicted, self.pop_smallest())
+            self.counters[source] = [self.evicted + 1, self.evicted]
+            self.push(self.evicted + 1, source)
+
+    def push(self, count, source):
+        heapq.heappush(self.heap, (count, source))
+        if len(self.heap) > 2 * self.capacity:
+            self.heap = [(counter[0], key) for key, counter in self.counters.items()]
+            heapq.heapify(self.heap)
+
+    def pop_smallest(self):
+        # Every counter has an entry at or under its count, so the first exact one is the smallest
+        while True:
+            count, source = heapq.heappop(self.heap)
+            counter = self.counters.get(source)
+            if counter is None or counter[0] < count:
+                continue
+            if counter[0] > count:
+                heapq.heappush(self.heap, (counter[0], source))
+                continue
+            del self.counters[source]
+            return count
+
+    @staticmethod
+    def top(counters, k):
+        # A source missing from a sketch may have had up to that sketch's evicted count there;
+        # those are added once at the end instead of visiting every source for every sketch
+        merged = {}
+        floors = 0
+        for sketch in counters:
+            for source, (count, error) in sketch.counters.items():
+                total = merged.get(source)
+                if total is None:
+                    total = merged[source] = [0, 0, 0]
+                total[0] += count
+                total[1] += error
+                total[2] += sketch.evicted
+            floors += sketch.evicted
+        ranked = heapq.nlargest(k, merged.items(), key=lambda item: item[1][0] - item[1][2])
+        return [(source, count + floors - own, error + floors - own) for source, (count, error, own) in ranked]
+
+
+class LedgerSample:
+    """Stratified bottom-k sample of the ledger with per-month sketches.
+
+    Each month is a stratum holding its exact row count and the rows whose
+    priority is under the stratum's threshold, at most `size` of them. A
+    row's priority is a fixed pseudo-random number derived from its row id,
+    so an updated row keeps its place in the sample and a deleted one just
+    leaves it; the threshold only drops, when an insert overfills the
+    stratum and the highest priority, the top of a max-heap, is let go. Whichever rows are in the ledger, the sampled ones are those
+    with the lowest priorities, a uniform sample of the month. Only the
+    fields an estimate reads are kept, never the rows themselves.
+
+    An estimate scales each stratum's matching sample rows up to the
+    stratum's row count and reports a 95% interval from the stratified
+    variance. Amount quantiles and top sources come from sketches kept per
+    (month, type, category), so for those the first and last month of a
+    date range count in full.
+    """
+
+    def __init__(self, size=SAMPLE_SIZE_PER_MONTH):
+        self.size = size
+        self.salt = random.getrandbits(64)
+        self.strata = {}
+        self.amounts = {}
+        self.sources = {}
+
+    def priority(self, row_id):
+        # splitmix64 of the salted row id, scaled to [0, 1)
+        z = ((row_id ^ self.salt) + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        return (z ^ (z >> 31)) / 2 ** 64
+
+    def track(self, transaction, sign, row_id):
+        month = transaction['date'][:7] if transaction['date'] else None
+        stratum = self.strata.get(month)
+        if stratum is None:
+            # [row count, priority threshold, row id -> sampled fields, (-priority, row id) heap]
+            stratum = self.strata[month] = [0, 1.0, {}, []]
+        rows, heap = stratum[2], stratum[3]
+        if sign > 0:
+            stratum[0] += 1
+            priority = self.priority(row_id)
+            if priority < stratum[1]:
+                rows[row_id] = (
+                    priority, transaction['date'], transaction['type'], transaction['category'],
+                    transaction['amount'], transaction['currency']
+                )
+                heapq.heappush(heap, (-priority, row_id))
+                if len(rows) > self.size:
+                    # Entries for rows removed since are skipped
+                    while True:
+                        priority, largest = heapq.heappop(heap)
+                        if largest in rows:
+                            break
+                    stratum[1] = -priority
+                    del rows[largest]
+                if len(heap) > 2 * self.size:
+                    stratum[3] = [(-entry[0], key) for key, entry in rows.items()]
+                    heapq.heapify(stratum[3])
+        else:
+            stratum[0] -= 1
+            rows.pop(row_id, None)
+            if not stratum[0]:
+                del self.strata[month]
+
+        key = (month, transaction['type'], transaction['category'])
+        amounts = self.amounts.get(key + (transaction['currency'],))
+        if amounts is None:
+            amounts = self.amounts[key + (transaction['currency'],)] = QuantileSketch()
+        amounts.add(transaction['amount'], sign)
+        sources = self.sources.get(key)
+        if sources is None:
+            sources = self.sources[key] = TopSources()
+        sources.add(str(transaction['source']).strip(), sign)
+
+    def estimate(self, value, category=None, transaction_type=None, start_date=None, end_date=None):
+        # value(amount, currency) is what a matching row contributes to the total
+        start, end = day_bounds(start_date, end_date)
+
+        def in_range(month):
+            if not (start or end):
+                return True
+            return month is not None and not (start and month < start[:7]) and not (end and month > end[:7])
+
+        def matches(entry):
+            _, date, entry_type, entry_category, _, _ = entry
+            if category and entry_category != category:
+                return False
+            if transaction_type and entry_type != transaction_type:
+                return False
+            if start or end:
+                if not date or (start and date < start) or (end and date > end):
+                    return False
+            return True
+
+        count = total = count_variance = total_variance = 0
+        for month, (row_count, _, sampled, _) in self.strata.items():
+            if not sampled or not in_range(month):
+                continue
+            rows = list(sampled.values())
+            hits = [1 if matches(entry) else 0 for entry in rows]
+            values = [value(entry[4], entry[5]) if hit else 0 for entry, hit in zip(rows, hits)]
+            count += row_count * sum(hits) / len(rows)
+            total += row_count * sum(values) / len(rows)
+            if 1 < len(rows) < row_count:
+                # Variance of the stratum total, with the finite population correction
+                correction = row_count * (row_count - len(rows)) / len(rows)
+                count_variance += correction * statistics.variance(hits)
+                total_variance += correction * statistics.variance(values)
+
+        quantiles = {}
+        for (month, key_type, key_category, currency), sketch in self.amounts.items():
+            if in_range(month) and (not category or key_category == category) and (not transaction_type or key_type == transaction_type):
+                quantiles.setdefault(currency, QuantileSketch()).merge(sketch)
+
+        top_sources = TopSources.top(
+            [
+                sketch for (month, key_type, key_category), sketch in self.sources.items()
+                if in_range(month) and (not category or key_category == category) and (not transaction_type or key_type == transaction_type)
+            ],
+            TOP_SOURCES_SHOWN
+        )
+
+        return {
+            'count': count,
+            'count_error': 1.96 * math.sqrt(count_variance),
+            'total': total,
+            'total_error': 1.96 * math.sqrt(total_variance),
+            'quantiles': {
+                currency: (sketch.quantile(0.5), sketch.quantile(0.9))
+                for currency, sketch in sorted(quantiles.items()) if sketch.count > 0
+            },
+            'top_sources': top_sources
+        }
+
+
+class Row(dict):
+    """A transaction read from a PagedTransactions store, tagged with its row id."""
+
+    __slots__ = ('row_id', '__weakref__')
+
+
+class TransactionList(list):
+    """The ledger's rows held in memory, the default storage.
+
+    Shares its interface with PagedTransactions so the tracker works the same
+    with either. Each row is its own handle here and is never written back.
+    """
+
+    def add_row(self, row, position=None):
+        if position is None:
+            self.append(row)
+        else:
+            self.insert(position, row)
+        return row
+
+    def write(self, row):
+        pass
+
+    def handle(self, row):
+        return row
+
+    def fetch(self, handle):
+        return handle
+
+    def row_id(self, row):
+        return id(row)
+
+    def detached(self, copy_rows=True):
+        return TransactionList(dict(t) for t in self) if copy_rows else TransactionList(self)
+
+    def is_stale(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class PagedTransactions:
+    """The ledger's rows kept on disk, with an LRU cache of parsed rows in memory.
+
+    Rows are JSON lines appended to `path` and never rewritten in place: an
+    edited row is appended again and its row id pointed at the new line.
+    Only the position -> row id order, the row id -> (offset, length) table
+    and at most `cache_size` rows stay resident. A row that is still
+    referenced elsewhere comes back as the same object, so identity checks
+    on rows keep working. Full scans read around the cache instead of
+    flushing it.
+    """
+
+    def __init__(self, path, index_path, cache_size, rows=None):
+        self.path = path
+        self.index_path = index_path
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.live = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.row_ids = array('q')
+        self.offsets = array('q')
+        self.lengths = array('q')
+
+        if rows is not None:
+            # An inline ledger is moved into a fresh row file
+            with open(path + '.tmp', 'wb') as file:
+                for row in rows:
+                    line = (json.dumps(row) + '\n').encode()
+                    self.row_ids.append(len(self.offsets))
+                    self.offsets.append(file.tell())
+                    self.lengths.append(len(line))
+                    file.write(line)
+            os.replace(path + '.tmp', path)
+            self.save_index()
+        else:
+            try:
+                with open(index_path, 'rb') as file:
+                    counts = array('q')
+                    counts.fromfile(file, 2)
+                    self.row_ids.fromfile(file, counts[0])
+                    self.offsets.fromfile(file, counts[1])
+                    self.lengths.fromfile(file, counts[1])
+            except FileNotFoundError:
+                pass
+
+        self.writer = open(path, 'ab')
+        self.reader = open(path, 'rb')
+
+
+    def save_index(self):
+        with open(self.index_path + '.tmp', 'wb') as file:
+            array('q', [len(self.row_ids), len(self.offsets)]).tofile(file)
+            self.row_ids.tofile(file)
+            self.offsets.tofile(file)
+            self.lengths.tofile(file)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.fetch(row_id) for row_id in self.row_ids[position]]
+        return self.fetch(self.row_ids[position])
+
+    def __iter__(self):
+        position = 0
+        while position < len(self.row_ids):
+            yield self.fetch(self.row_ids[position], scan=True)
+            position += 1
+
+    def __delitem__(self, position):
+        self.pop(position)
+
+
+    def fetch(self, row_id, scan=False):
+        row = self.cache.get(row_id)
+        if row is not None:
+            self.hits += 1
+            if not scan:
+                self.cache.move_to_end(row_id)
+            return row
+
+        row = self.live.get(row_id)
+        if row is None:
+            self.misses += 1
+            self.reader.seek(self.offsets[row_id])
+            row = Row(json.loads(self.reader.read(self.lengths[row_id])))
+            row.row_id = row_id
+            self.live[row_id] = row
+        else:
+            self.hits += 1
+
+        if not scan:
+            self.remember(row)
+        return row
+
+
+    def remember(self, row):
+        self.cache[row.row_id] = row
+        self.cache.move_to_end(row.row_id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+
+    def write_line(self, row):
+        line = (json.dumps(row) + '\n').encode()
+        self.writer.seek(0, os.SEEK_END)
+        offset = self.writer.tell()
+        self.writer.write(line)
+        self.writer.flush()
+        return offset, len(line)
+
+
+    def add_row(self, row, position=None):
+        row = Row(row)
+        row.row_id = len(self.offsets)
+        offset, length = self.write_line(row)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        if position is None:
+            self.row_ids.append(row.row_id)
+        else:
+            self.row_ids.insert(position, row.row_id)
+        self.live[row.row_id] = row
+        self.remember(row)
+        return row
+
+    def append(self, row):
+        self.add_row(row)
+
+    def insert(self, position, row):
+        self.add_row(row, position)
+
+
+    def write(self, row):
+        # Called after a row was edited in place
+        self.offsets[row.row_id], self.lengths[row.row_id] = self.write_line(row)
+        self.remember(row)
+
+
+    def pop(self, position=-1):
+        row = self.fetch(self.row_ids[position])
+        del self.row_ids[position]
+        self.offsets[row.row_id] = -1
+        self.cache.pop(row.row_id, None)
+        return row
+
+
+    def handle(self, row):
+        return row.row_id
+
+    def row_id(self, row):
+        return row.row_id
+
+
+    def detached(self, copy_rows=True):
+        # Lines are never rewritten, so copies of the tables keep describing this version
+        return PagedView(self.path, self.row_ids[:], self.offsets[:], self.lengths[:])
+
+
+    def is_stale(self):
+        # Another instance moved a fresh row file into place
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        opened = os.fstat(self.writer.fileno())
+        return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+
+    def stats(self):
+        return {
+            'rows': len(self.row_ids),
+            'cached': len(self.cache),
+            'cache_size': self.cache_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+
+class PagedView:
+    """Read-only copy of a PagedTransactions version with its own file handle.
+
+    Handed to readers on other threads, which must not touch the store's
+    cache. Rows are parsed fresh on every pass.
+    """
+
+    def __init__(self, path, row_ids, offsets, lengths):
+        self.row_ids = row_ids
+        self.offsets = offsets
+        self.lengths = lengths
+        self.reader = open(path, 'rb')
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def __iter__(self):
+        for row_id in self.row_ids:
+            with self.lock:
+                self.reader.seek(self.offsets[row_id])
+                line = self.reader.read(self.lengths[row_id])
+            yield json.loads(line)
+
+
+class WindowManager:
+    """Builds each dialog once and hands the same Toplevel back afterwards.
+
+    build(window) creates the widgets and returns a refresh function (or
+    None) that updates only the data-bound parts; it runs every time the
+    window is shown. Closing a window hides it for reuse. Live windows are
+    also refreshed whenever the ledger changes while they are open.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.windows = {}
+
+
+    def show(self, name, title, build, live=False):
+        entry = self.windows.get(name)
+        if entry is None or not entry['window'].winfo_exists():
+            window = tk.Toplevel(self.root)
+            window.title(title)
+            window.geometry("1000x1000")
+            window.protocol("WM_DELETE_WINDOW", window.withdraw)
+            entry = {'window': window, 'refresh': build(window), 'live': live}
+            self.windows[name] = entry
+
+        if entry['refresh'] is not None:
+            entry['refresh']()
+        entry['window'].deiconify()
+        entry['window'].lift()
+        return entry['window']
+
+
+    def refresh_live(self):
+        for entry in self.windows.values():
+            window = entry['window']
+            if entry['live'] and window.winfo_exists() and window.state() != 'withdrawn':
+                entry['refresh']()
+
+
+    def destroy_all(self):
+        for entry in self.windows.values():
+            if entry['window'].winfo_exists():
+                entry['window'].destroy()
+        self.windows.clear()
+
+
+class Dashboard:
+    """Balance, month-to-date expenses by category and recent transactions on the main window.
+
+    Subscribes to the tracker's change notifications and applies each one to
+    its own month-to-date totals. Repaints are deferred with root.after, so a
+    burst of changes is drawn once and only the categories that changed are touched.
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.root = tracker.root
+        self.month = None
+        self.month_to_date = {}
+        self.changed_categories = set()
+        self.needs_reload = True
+        self.pending = None
+
+        frame = tk.Frame(self.root)
+        frame.pack(fill='both', expand=True, padx=20)
+
+        self.balance_label = tk.Label(frame, font=("Serif", 24))
+        self.balance_label.pack(pady=10)
+
+        self.month_label = tk.Label(frame, font=("Serif", 14))
+        self.month_label.pack()
+
+        self.month_tree = ttk.Treeview(frame, columns=("Category", "Spent"), show="headings", height=8)
+        self.month_tree.heading("Category", text="Category")
+        self.month_tree.heading("Spent", text="Spent")
+        self.month_tree.pack(fill='x', pady=5)
+
+        recent_label = tk.Label(frame, text="Recent Transactions", font=("Serif", 14))
+        recent_label.pack()
+
+        self.recent_tree = ttk.Treeview(
+            frame,
+            columns=("Index", "Amount", "Currency", "Category", "Date", "Type", "Source"),
+            show="headings",
+            height=DASHBOARD_RECENT_COUNT
+        )
+        for column in ("Index", "Amount", "Currency", "Category", "Date", "Type", "Source"):
+            self.recent_tree.heading(column, text=column)
+        self.recent_tree.pack(fill='x', pady=5)
+
+        tracker.subscribe(self.on_change)
+        self.repaint()
+
+
+    def on_change(self, change, transaction):
+        if change == 'reloaded':
+            self.needs_reload = True
+        elif transaction['type'] == 'Expense' and transaction['date'] and transaction['date'][:7] == self.month:
+            sign = 1 if change == 'added' else -1
+            key = (transaction['category'], transaction['currency'])
+            self.month_to_date[key] = self.month_to_date.get(key, 0) + sign * transaction['amount']
+            self.changed_categories.add(transaction['category'])
+
+        if self.pending is None:
+            self.pending = self.root.after(REFRESH_DEBOUNCE_MS, self.repaint)
+
+
+    def repaint(self):
+        self.pending = None
+
+        month = datetime.now().strftime("%Y-%m")
+        if self.needs_reload or month != self.month:
+            # Seeded from the tracker's per-(category, month, currency) counters, not the transactions
+            self.month = month
+            self.month_to_date = {
+                (category, currency): amount for (category, usage_month, currency), amount in self.tracker.budget_usage.items()
+                if usage_month == month
+            }
+            self.month_tree.delete(*self.month_tree.get_children())
+            self.changed_categories = {category for category, currency in self.month_to_date}
+            self.needs_reload = False
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        memo = {}
+        try:
+            balance = f"{self.tracker.get_balance_in_base():.2f} {self.tracker.base_currency}"
+        except ValueError as e:
+            balance = str(e)
+        self.balance_label.config(text=f"Balance: {balance}")
+        self.month_label.config(text=f"Month to Date ({self.month})")
+
+        for category in self.changed_categories:
+            spent_by_currency = {
+                currency: amount for (spent_category, currency), amount in self.month_to_date.items()
+                if spent_category == category
+            }
+            try:
+                spent = f"{self.tracker.convert_totals(spent_by_currency, today, memo):.2f} {self.tracker.base_currency}"
+            except ValueError as e:
+                spent = str(e)
+            values = (category, spent)
+            if self.month_tree.exists(category):
+                self.month_tree.item(category, values=values)
+            else:
+                self.month_tree.insert("", tk.END, iid=category, values=values)
+        self.changed_categories = set()
+
+        self.recent_tree.delete(*self.recent_tree.get_children())
+        for transaction in reversed(self.tracker.transactions[-DASHBOARD_RECENT_COUNT:]):
+            self.recent_tree.insert("", tk.END, values=(
+                transaction['index'],
+                transaction['amount'],
+                transaction['currency'],
+                transaction['category'],
+                transaction['date'],
+                transaction['type'],
+                transaction['source']
+            ))
 
 
 class FinanceTracker:
-    def __init__(self):
-        self.transactions = []
+    def __init__(self, gui=True, row_cache_size=None):
+        self.row_cache_size = row_cache_size
+        self.transactions = TransactionList()
         self.categories = set(["Food", "Transportation", "Entertainment", "Utilities", "Salary", "Other"])
-        self.balance = 0
-        self.load_data()
+        self.base_currency = DEFAULT_CURRENCY
+        self.balances = {}
+        self.exchange_rates = None
+        self.budgets = {}
+        self.budget_usage = {}
+        self.daily_totals = {}
+        self.duplicate_index = {}
+        self.rules = []
+        self.category_matcher = None
+        self.undo_stack = []
+        self.redo_stack = []
+        self.last_error = None
+        self.last_warning = None
+        self.root = None
+        self.lock_depth = 0
+        # Dialogs raised while the ledger lock is held, shown once it is released
+        self.pending_messages = []
+        self.journal_offset = 0
+        self.data_mtime = None
+        self.result_filters = {}
+        self.listeners = []
+        self.refresh_pending = None
+        self.ledger_sample = LedgerSample()
+        self.query_executor = None
+        with self.ledger_lock(sync=False):
+            self.load_data()
+
+        # Without a GUI (e.g. in server mode) messages are kept on the instance instead
+        if not gui:
+            return
 
 
         self.root = tk.Tk()
@@ -22,113 +861,360 @@ class FinanceTracker:
         app_title_label.pack(pady=20)
 
 
+        # Styles are configured once here rather than every time a report opens
+        style = ttk.Style(self.root)
+        style.configure("Bold.Treeview", font=('Helvetica', 10, 'bold'))
+
+        self.windows = WindowManager(self.root)
+        self.dashboard = Dashboard(self)
+
+
+    def subscribe(self, listener):
+        # listener(change, transaction) is called with 'added' or 'removed' for
+        # every transaction entering or leaving the ledger (an update is a
+        # removal of the old values followed by an addition of the new ones),
+        # and with 'reloaded' and no transaction after a full load. The
+        # transaction is live and must be read during the call.
+        self.listeners.append(listener)
+
+
+    def notify(self, change, transaction):
+        for listener in self.listeners:
+            listener(change, transaction)
+
+
+    def data_changed(self):
+        # Open report windows are redrawn in place once things settle down
+        if self.root is not None and self.refresh_pending is None:
+            self.refresh_pending = self.root.after(REFRESH_DEBOUNCE_MS, self.refresh_windows)
+
+
+    def refresh_windows(self):
+        self.refresh_pending = None
+        self.windows.refresh_live()
+
+
+    def close(self):
+        if self.query_executor is not None:
+            self.query_executor.shutdown(wait=False)
+        self.transactions.close()
+        self.windows.destroy_all()
+        self.root.destroy()
+
+
+    def show_error(self, title, message):
+        if self.root is None:
+            self.last_error = message
+        else:
+            self.show_message(messagebox.showerror, title, message)
+
+
+    def show_warning(self, title, message):
+        if self.root is None:
+            self.last_warning = message
+        else:
+            self.show_message(messagebox.showwarning, title, message)
+
+
+    def show_info(self, title, message):
+        if self.root is not None:
+            self.show_message(messagebox.showinfo, title, message)
+
+
+    def show_message(self, show, title, message):
+        # A modal dialog must not keep other instances waiting on the ledger lock
+        if self.lock_depth:
+            self.pending_messages.append((show, title, message))
+        else:
+            show(title=title, message=message)
+
+
+    def show_pending_messages(self):
+        messages, self.pending_messages = self.pending_messages, []
+        for show, title, message in messages:
+            show(title=title, message=message)
+
+
     def load_data(self):
         try:
             with open('transactions.json', 'r') as file:
                 data = json.load(file)
-                self.transactions = data['transactions']
-                self.balance = data['balance']
+                transactions = data.get('transactions')
                 self.categories = set(data['categories'])
+                self.budgets = data.get('budgets', {})
+                self.rules = data.get('rules', [])
+                self.base_currency = data.get('base_currency', DEFAULT_CURRENCY)
         except FileNotFoundError:
-            self.transactions = []
-            self.balance = 0
+            transactions = []
             self.categories = set(["Food", "Transportation", "Entertainment", "Utilities", "Salary", "Other"])
+            self.budgets = {}
+            self.rules = []
+            self.base_currency = DEFAULT_CURRENCY
+
+        if transactions is not None:
+            # Ledgers from before multi-currency support are entirely in the base currency
+            for transaction in transactions:
+                transaction.setdefault('currency', self.base_currency)
+
+        # Without transactions inline the rows live in the row store
+        self.transactions.close()
+        if self.row_cache_size is not None:
+            self.transactions = PagedTransactions(ROW_STORE_PATH, ROW_INDEX_PATH, self.row_cache_size, transactions)
+        elif transactions is None:
+            store = PagedTransactions(ROW_STORE_PATH, ROW_INDEX_PATH, 0)
+            self.transactions = TransactionList(dict(t) for t in store)
+            store.close()
+        else:
+            self.transactions = TransactionList(transactions)
+
+        self.category_matcher = None
+        self.rebuild_indexes()
+        if self.row_cache_size is not None and transactions:
+            # Drop the inline copy now that the rows have moved
+            self.save_data()
+        self.journal_offset = self.get_journal_size()
+        self.data_mtime = self.get_data_mtime()
 
 
     def save_data(self):
         data = {
-            'transactions': self.transactions,
-            'balance': self.balance,
-            'categories': list(self.categories)
+            'categories': list(self.categories),
+            'budgets': self.budgets,
+            'rules': self.rules,
+            'base_currency': self.base_currency
         }
-        with open('transactions.json', 'w') as file:
+        if self.row_cache_size is None:
+            data['transactions'] = self.transactions
+        else:
+            # The rows are already on disk, only their order and offsets are saved
+            self.transactions.save_index()
+        # Write to a temporary file and swap it in so other instances never read a half-written ledger
+        with open('transactions.json.tmp', 'w') as file:
             json.dump(data, file)
+        os.replace('transactions.json.tmp', 'transactions.json')
+        self.data_mtime = self.get_data_mtime()
+        self.data_changed()
+
+
+    @contextmanager
+    def ledger_lock(self, sync=True, blocking=True):
+        # Advisory lock shared by every instance writing transactions.json.
+        # Yields False, without the lock, when it is taken and blocking is off.
+        if self.lock_depth:
+            self.lock_depth += 1
+            try:
+                yield True
+            finally:
+                self.lock_depth -= 1
+            return
+
+        try:
+            with open('transactions.json.lock', 'a+') as lock_file:
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                except OSError:
+                    if blocking:
+                        raise
+                    yield False
+                    return
+
+                self.lock_depth = 1
+                try:
+                    if sync:
+                        self.sync_external_changes()
+                    yield True
+                finally:
+                    self.lock_depth = 0
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.show_pending_messages()
 
 
-    def add_transaction(self, amount, category, date, transaction_type, source):
+    def get_journal_size(self):
+        try:
+            return os.path.getsize('operations.jsonl')
+        except FileNotFoundError:
+            return 0
+
+
+    def get_data_mtime(self):
+        try:
+            return os.stat('transactions.json').st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+    def has_external_changes(self):
+        # Cheap check that needs no lock, done before paying for a sync
+        return self.get_journal_size() != self.journal_offset or self.get_data_mtime() != self.data_mtime
+
+
+    def sync_external_changes(self):
+        # Must be called with the ledger lock held. Every write appends to
+        # operations.jsonl before saving, so the entries past our offset are
+        # exactly what other instances changed and can be replayed in order.
+        journal_size = self.get_journal_size()
+        changed = False
+
+        if journal_size < self.journal_offset or self.transactions.is_stale():
+            # The journal or row file was replaced, nothing to replay from
+            self.load_data()
+            changed = True
+
+        elif journal_size > self.journal_offset:
+            with open('operations.jsonl', 'rb') as file:
+                file.seek(self.journal_offset)
+                pending = file.read(journal_size - self.journal_offset)
+
+            complete = pending[:pending.rfind(b'\n') + 1]
+            for line in complete.splitlines():
+                if line.strip():
+                    self.apply_operation(json.loads(line))
+            self.journal_offset += len(complete)
+            self.data_mtime = self.get_data_mtime()
+            changed = bool(complete)
+
+        elif self.get_data_mtime() != self.data_mtime:
+            # Changed without a journal entry, e.g. edited by hand
+            self.load_data()
+            changed = True
+
+        if changed:
+            # Positions recorded for undo may no longer line up
+            self.undo_stack.clear()
+            self.redo_stack.clear()
+        return changed
+
+
+    def refresh_from_disk(self):
+        if not self.has_external_changes():
+            return False
+        with self.ledger_lock(sync=False, blocking=False) as locked:
+            if not locked:
+                # Another instance is writing, so pick its changes up on the next poll
+                return False
+            changed = self.sync_external_changes()
+        if changed:
+            self.data_changed()
+        return changed
+
+
+    def add_transaction(self, amount, category, date, transaction_type, source, currency=None):
+        # Validated and checked for duplicates before the ledger lock is taken,
+        # since the duplicate prompt waits on the user
+        self.refresh_from_disk()
+
         # First check if amount contains any non-numeric characters (except decimal point)
         if any(c.isalpha() or (not c.isdigit() and c != '.') for c in str(amount)):
-            messagebox.showerror(title="Error", message="Numbers only.")
+            self.show_error(title="Error", message="Numbers only.")
             return False
 
         try:
             amount = float(amount)
             if amount <= 0:
-                messagebox.showerror(title="Error", message="Amount must be greater than zero.")
+                self.show_error(title="Error", message="Amount must be greater than zero.")
                 return False
 
             # Check decimal places
             if '.' in str(amount) and len(str(amount).split('.')[-1]) > 2:
-                messagebox.showerror(title="Error", message="Amount cannot have more than 2 decimal places")
+                self.show_error(title="Error", message="Amount cannot have more than 2 decimal places")
                 return False
 
         except ValueError:
-            messagebox.showerror(title="Error", message="Invalid amount format.")
+            self.show_error(title="Error", message="Invalid amount format.")
             return False
 
         if category not in self.categories:
-            messagebox.showerror(f"Error: Category '{category}' is not valid.")
+            self.show_error(title="Error", message=f"Category '{category}' is not valid.")
             return False
 
         if transaction_type not in ['Income', 'Expense']:
-            messagebox.showerror(title="Error:", message="Transaction type must be 'Income' or 'Expense'.")
+            self.show_error(title="Error", message="Transaction type must be 'Income' or 'Expense'.")
+            return False
+
+        currency = self.validate_currency(currency or self.base_currency)
+        if not currency:
             return False
 
         # Validate and format date
         formatted_date = self.format_date(date)
+        if not formatted_date:
+            return False
 
         transaction = {
             'amount': amount,
+            'currency': currency,
             'category': category,
             'date': formatted_date,  # Use the formatted date
             'type': transaction_type,
             'source': source
         }
 
-        transaction['index'] = len(self.transactions) 
-        self.transactions.append(transaction)
+        confirmed = []
+        while True:
+            duplicates = [match for match in self.find_duplicates(transaction) if dict(match) not in confirmed]
+            if duplicates and not self.confirm_duplicate(transaction, duplicates):
+                return False
+            confirmed += [dict(match) for match in duplicates]
+            added = self.insert_transaction(transaction, confirmed)
+            if added is not None:
+                return added
+
+
+    @writes_ledger
+    def insert_transaction(self, transaction, confirmed):
+        # Returns None, adding nothing, when another instance wrote a duplicate
+        # the user has not been asked about
+        if transaction['category'] not in self.categories:
+            self.show_error(title="Error", message=f"Category '{transaction['category']}' is not valid.")
+            return False
+        if any(dict(match) not in confirmed for match in self.find_duplicates(transaction)):
+            return None
 
-        if transaction_type == 'Income':
-            self.balance += amount
-        elif transaction_type == 'Expense':
-            self.balance -= amount
+        transaction = dict(transaction, index=len(self.transactions))
+        transaction = self.transactions.add_row(transaction)
+        self.track_transaction(transaction, 1)
+        self.log_operation({'op': 'add', 'position': len(self.transactions) - 1, 'before': None, 'after': dict(transaction)})
 
         self.save_data()
+        self.check_budget(transaction)
         return True
         
     def view_balance(self):
-        print(f"Current Balance: ${self.balance:.2f}")
+        try:
+            print(f"Current Balance: {self.get_balance_in_base():.2f} {self.base_currency}")
+        except ValueError as e:
+            print(f"Current Balance: {e}")
 
 
     def generate_summary(self, start_date, end_date):
-        income = 0
-        expenses = 0
-        category_expenses = {category: 0 for category in self.categories}
-
         try:
-            filtered_transactions = self.filter_transactions(start_date=start_date, end_date=end_date)
-
-            for transaction in filtered_transactions:
-                if transaction['type'] == 'Income':
-                    income += transaction['amount']
-                else:  # Expense
-                    expenses += transaction['amount']
-                    category_expenses[transaction['category']] += transaction['amount']
+            # Same totals as the period reports, converted to the base currency
+            income, expenses, _, category_expenses = self.calculate_report(start_date, end_date)
+            currency = self.base_currency
 
             summary_text = f"Summary from {start_date.date()} to {end_date.date()}: \n"
-            summary_text += f"Total Income: ${income:.2f} \n"
-            summary_text += f"Total Expenses: ${expenses:.2f} \n"
+            summary_text += f"Total Income: {income:.2f} {currency} \n"
+            summary_text += f"Total Expenses: {expenses:.2f} {currency} \n"
             summary_text += "Expenses by Category: \n"
 
-            for category, amount in category_expenses.items():
-                summary_text += f"  {category}: ${amount:.2f} \n"
+            for category in sorted(category_expenses):
+                summary_text += f"  {category}: {category_expenses[category]:.2f} {currency} \n"
 
-            summary_text += f"Net Balance: ${income - expenses:.2f} \n"
+            summary_text += f"Net Balance: {income - expenses:.2f} {currency} \n"
 
             return summary_text
 
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred while generating summary: {e}")
+            self.show_error("Error", f"An error occurred while generating summary: {e}")
             return ""
             
     def format_date(self, date_string):
@@ -138,7 +1224,7 @@ class FinanceTracker:
 
             # Validate year is 4 digits
             if len(year) != 4:
-                messagebox.showerror(title="Error", message="Year must be 4 digits (YYYY)")
+                self.show_error(title="Error", message="Year must be 4 digits (YYYY)")
                 return None
 
             # Convert to datetime object to validate the date
@@ -146,152 +1232,748 @@ class FinanceTracker:
 
             # Check if date is in the future
             if date_obj.date() > datetime.now().date():
-                messagebox.showerror(title="Error", message="Date must be within the time")
+                self.show_error(title="Error", message="Date must be within the time")
                 return None
 
             # Format back to ensure YYYY-MM-DD with leading zeros
             return date_obj.strftime("%Y-%m-%d")
         except ValueError:
-            # Only show error if it's not already handled by the above conditions
-            if '-' not in date_string:
-                messagebox.showerror(title="Error", message="Invalid date format. Please use YYYY-MM-DD.")
+            self.show_error(title="Error", message="Invalid date format. Please use YYYY-MM-DD.")
             return None
 
-    def update_transaction(self, index, new_amount=None, new_category=None, new_date=None, new_type=None):
+    @writes_ledger
+    def update_transaction(self, index, new_amount=None, new_category=None, new_date=None, new_type=None, new_currency=None):
         try:
             index = int(index)
             if index < 0 or index >= len(self.transactions):
-                messagebox.showerror(title="Error", message="Invalid transaction index.")
+                self.show_error(title="Error", message="Invalid transaction index.")
                 return False
 
             transaction = self.transactions[index]
+            before = dict(transaction)
+            committed = False
+            # The balance, budget usage and duplicate index are kept as running
+            # totals, so take the old values out and put whatever the
+            # transaction ends up as back in.
+            self.track_transaction(transaction, -1)
+            try:
+                if new_amount is not None:
+                    # Check for non-numeric characters first
+                    if any(c.isalpha() or (not c.isdigit() and c != '.') for c in str(new_amount)):
+                        self.show_error(title="Error", message="Numbers only.")
+                        return False
 
-            if new_amount is not None:
-                # Check for non-numeric characters first
-                if any(c.isalpha() or (not c.isdigit() and c != '.') for c in str(new_amount)):
-                    messagebox.showerror(title="Error", message="Numbers only.")
-                    return False
+                    try:
+                        new_amount = float(new_amount)
+                        if new_amount <= 0:
+                            self.show_error(title="Error", message="Amount must be greater than zero.")
+                            return False
 
-                try:
-                    new_amount = float(new_amount)
-                    if new_amount <= 0:
-                        messagebox.showerror(title="Error", message="Amount must be greater than zero.")
-                        return False
+                        # Check decimal places
+                        if '.' in str(new_amount) and len(str(new_amount).split('.')[-1]) > 2:
+                            self.show_error(title="Error", message="Amount cannot have more than 2 decimal places")
+                            return False
 
-                    # Check decimal places
-                    if '.' in str(new_amount) and len(str(new_amount).split('.')[-1]) > 2:
-                        messagebox.showerror(title="Error", message="Amount cannot have more than 2 decimal places")
+                        transaction['amount'] = new_amount
+                    except ValueError:
+                        self.show_error(title="Error", message="Invalid amount format.")
                         return False
 
-                    transaction['amount'] = new_amount
-                except ValueError:
-                    messagebox.showerror(title="Error", message="Invalid amount format.")
-                    return False
-
-            if new_category is not None:
-                if new_category not in self.categories:
-                    messagebox.showerror(title="Error", message="Invalid category selected.")
-                    return False
-                transaction['category'] = new_category
+                if new_category is not None:
+                    if new_category not in self.categories:
+                        self.show_error(title="Error", message="Invalid category selected.")
+                        return False
+                    transaction['category'] = new_category
 
-            if new_date is not None:
-                formatted_date = self.format_date(new_date)
-                transaction['date'] = formatted_date
+                if new_date is not None:
+                    formatted_date = self.format_date(new_date)
+                    if not formatted_date:
+                        return False
+                    transaction['date'] = formatted_date
 
-            if new_type is not None:
-                if new_type not in ['Income', 'Expense']:
-                    messagebox.showerror(title="Error", message="Transaction type must be 'Income' or 'Expense'.")
-                    return False
-                transaction['type'] = new_type
+                if new_type is not None:
+                    if new_type not in ['Income', 'Expense']:
+                        self.show_error(title="Error", message="Transaction type must be 'Income' or 'Expense'.")
+                        return False
+                    transaction['type'] = new_type
 
-            self.save_data()
+                if new_currency is not None:
+                    new_currency = self.validate_currency(new_currency)
+                    if not new_currency:
+                        return False
+                    transaction['currency'] = new_currency
+
+                self.transactions.write(transaction)
+                self.log_operation({'op': 'update', 'position': index, 'before': before, 'after': dict(transaction)})
+                self.save_data()
+                committed = True
+            finally:
+                # A rejected field must not leave the earlier ones half applied
+                if not committed:
+                    transaction.clear()
+                    transaction.update(before)
+                self.track_transaction(transaction, 1)
+
+            self.check_budget(transaction)
             return True
 
         except ValueError:
-            messagebox.showerror(title="Error", message="Invalid index format.")
+            self.show_error(title="Error", message="Invalid index format.")
             return False
 
     def delete_transaction(self, index):
         if index < 0 or index >= len(self.transactions):
-            messagebox.showerror(title="Error", message="Invalid transaction index.")
+            self.show_error(title="Error", message="Invalid transaction index.")
             return
         del self.transactions[index]
         self.save_data()
 
 
+    @writes_ledger
     def add_category(self, category_name):
+        if not isinstance(category_name, str) or not category_name.strip():
+            self.show_error(title="Error", message="Please enter a category name.")
+            return False
         if category_name in self.categories:
-            messagebox.showerror(f"Error: Category '{category_name}' already exists.")
+            self.show_error(title="Error", message=f"Category '{category_name}' already exists.")
+            return False
         else:
             self.categories.add(category_name)
+            self.log_operation({'op': 'add_category', 'category': category_name})
             self.save_data()
+            return True
 
 
+    @writes_ledger
     def remove_category(self, category_name):
         if category_name not in self.categories:
-            messagebox.showerror(f"Error: Category '{category_name}' does not exist.")
+            self.show_error(title="Error", message=f"Category '{category_name}' does not exist.")
+            return False
         else:
             self.categories.remove(category_name)
+            budget = self.budgets.pop(category_name, None)
+            self.log_operation({'op': 'remove_category', 'category': category_name, 'budget': budget})
             self.save_data()
+            return True
 
 
-    def get_weekly_summary(self):
-        end_date = datetime.now()
-        start_date = end_date - timedelta(weeks=1)
+    def log_operation(self, operation, reason=None):
+        self.log_operations([operation], reason)
+
+
+    def log_operations(self, operations, reason=None):
+        # Every mutation is appended to operations.jsonl with before/after values.
+        # The file is only read when the history view pages through it.
+        timestamp = datetime.now().isoformat(timespec='seconds')
+        try:
+            user = getpass.getuser()
+        except Exception:
+            user = 'unknown'
+
+        entries = []
+        for operation in operations:
+            entry = dict(operation)
+            entry['timestamp'] = timestamp
+            entry['user'] = user
+            if reason:
+                entry['reason'] = reason
+            entries.append(json.dumps(entry) + '\n')
+
+        with open('operations.jsonl', 'a') as file:
+            file.writelines(entries)
+            self.journal_offset = file.tell()
+
+        # The operations logged together, e.g. a whole import, undo as one step
+        if reason is None:
+            self.undo_stack.append(list(operations))
+            self.redo_stack.clear()
+
+
+    def invert_operation(self, operation):
+        inverse = dict(operation)
+        if operation['op'] in ('add', 'delete', 'update'):
+            inverse['op'] = {'add': 'delete', 'delete': 'add', 'update': 'update'}[operation['op']]
+            inverse['before'] = operation['after']
+            inverse['after'] = operation['before']
+        elif operation['op'] == 'set_budget':
+            inverse['before'] = operation['after']
+            inverse['after'] = operation['before']
+        elif operation['op'] in ('add_rule', 'remove_rule'):
+            inverse['op'] = 'remove_rule' if operation['op'] == 'add_rule' else 'add_rule'
+        else:
+            inverse['op'] = 'remove_category' if operation['op'] == 'add_category' else 'add_category'
+        return inverse
+
+
+    def apply_operation(self, operation):
+        op = operation['op']
+
+        if op == 'add':
+            transaction = dict(operation['after'])
+            transaction.setdefault('currency', self.base_currency)
+            transaction = self.transactions.add_row(transaction, operation['position'])
+            self.track_transaction(transaction, 1)
+
+        elif op == 'delete':
+            transaction = self.transactions.pop(operation['position'])
+            self.track_transaction(transaction, -1)
+
+        elif op == 'update':
+            transaction = self.transactions[operation['position']]
+            self.track_transaction(transaction, -1)
+            transaction.clear()
+            transaction.update(operation['after'])
+            transaction.setdefault('currency', self.base_currency)
+            self.transactions.write(transaction)
+            self.track_transaction(transaction, 1)
+
+        elif op == 'add_category':
+            self.categories.add(operation['category'])
+            if operation.get('budget') is not None:
+                self.budgets[operation['category']] = operation['budget']
+
+        elif op == 'remove_category':
+            self.categories.discard(operation['category'])
+            self.budgets.pop(operation['category'], None)
+
+        elif op == 'set_budget':
+            if operation['after'] is None:
+                self.budgets.pop(operation['category'], None)
+            else:
+                self.budgets[operation['category']] = operation['after']
+
+        elif op == 'add_rule':
+            self.rules.insert(operation['position'], dict(operation['rule']))
+            self.category_matcher = None
+
+        elif op == 'remove_rule':
+            del self.rules[operation['position']]
+            self.category_matcher = None
+
+
+    @writes_ledger
+    def undo(self):
+        if not self.undo_stack:
+            self.show_info(title="Undo", message="Nothing to undo.")
+            return False
+
+        operations = self.undo_stack.pop()
+        inverses = [self.invert_operation(operation) for operation in reversed(operations)]
+        for inverse in inverses:
+            self.apply_operation(inverse)
+        self.log_operations(inverses, reason='undo')
+        self.redo_stack.append(operations)
+        self.save_data()
+        return True
+
+
+    @writes_ledger
+    def redo(self):
+        if not self.redo_stack:
+            self.show_info(title="Redo", message="Nothing to redo.")
+            return False
+
+        operations = self.redo_stack.pop()
+        for operation in operations:
+            self.apply_operation(operation)
+        self.log_operations(operations, reason='redo')
+        self.undo_stack.append(operations)
+        self.save_data()
+        return True
+
+
+    def iter_operation_history(self, block_size=65536):
+        # Yield logged operations newest first, reading the file backwards one
+        # block at a time so only the pages actually viewed are ever parsed.
+        try:
+            file = open('operations.jsonl', 'rb')
+        except FileNotFoundError:
+            return
+
+        with file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            remainder = b''
+            while position > 0:
+                read_size = min(block_size, position)
+                position -= read_size
+                file.seek(position)
+                lines = (file.read(read_size) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield json.loads(line)
+            if remainder.strip():
+                yield json.loads(remainder)
+
+
+    def track_transaction(self, transaction, sign):
+        # Every running total and index is updated through here when a
+        # transaction enters (sign 1) or leaves (sign -1) the ledger.
+        self.track_balance(transaction, sign)
+        self.track_budget_usage(transaction, sign)
+        self.track_daily_totals(transaction, sign)
+        self.track_duplicates(transaction, sign)
+        self.ledger_sample.track(transaction, sign, self.transactions.row_id(transaction))
+        if self.listeners:
+            self.notify('added' if sign > 0 else 'removed', transaction)
+
+
+    def rebuild_indexes(self):
+        # Everything but the rows themselves is derived here
+        self.budget_usage = {}
+        self.daily_totals = {}
+        self.duplicate_index = {}
+        self.balances = {}
+        self.ledger_sample = LedgerSample()
+        for transaction in self.transactions:
+            self.track_budget_usage(transaction, 1)
+            self.track_daily_totals(transaction, 1)
+            self.track_duplicates(transaction, 1)
+            self.ledger_sample.track(transaction, 1, self.transactions.row_id(transaction))
+            self.track_balance(transaction, 1)
+        self.notify('reloaded', None)
+
+
+    def track_balance(self, transaction, sign):
+        if transaction['type'] == 'Expense':
+            sign = -sign
+        # Kept per currency, amounts in different currencies are only added up after conversion
+        self.balances[transaction['currency']] = self.balances.get(transaction['currency'], 0) + sign * transaction['amount']
+
+
+    def track_budget_usage(self, transaction, sign):
+        # Running expense totals per (category, month), updated on every mutation
+        # so budget checks never have to rescan the month.
+        if transaction['type'] != 'Expense' or not transaction['date']:
+            return
+        key = (transaction['category'], transaction['date'][:7], transaction['currency'])
+        self.budget_usage[key] = self.budget_usage.get(key, 0) + sign * transaction['amount']
+
+
+    def duplicate_key(self, transaction):
+        # Normalized so that statement re-imports with different spacing or case still collide
+        source = ' '.join(str(transaction['source']).casefold().split())
+        return round(transaction['amount'], 2), transaction['currency'], source, transaction['type']
+
+
+    def track_daily_totals(self, transaction, sign):
+        # (amount, row count) per day and (type, category, currency), enough to answer any date-range report
+        if not transaction['date']:
+            return
+        totals = self.daily_totals.setdefault(transaction['date'], {})
+        key = (transaction['type'], transaction['category'], transaction['currency'])
+        amount, count = totals.get(key, (0, 0))
+        if count + sign:
+            totals[key] = (amount + sign * transaction['amount'], count + sign)
+        else:
+            del totals[key]
+            if not totals:
+                del self.daily_totals[transaction['date']]
+
+
+    def track_duplicates(self, transaction, sign):
+        # Transactions bucketed by a hash of the day and (amount, source, type),
+        # so a duplicate check is a handful of dict lookups instead of a ledger
+        # scan. Only the hash and a row handle are kept per transaction, which
+        # is a row id when rows are paged; find_duplicates checks the full key.
+        # A bucket is a bare handle until a second transaction lands in it.
+        if not transaction['date']:
+            return
+        day = calendar_date.fromisoformat(transaction['date']).toordinal()
+        bucket_key = hash((day, self.duplicate_key(transaction)))
+        bucket = self.duplicate_index.get(bucket_key)
+
+        if sign > 0:
+            handle = self.transactions.handle(transaction)
+            if bucket is None:
+                self.duplicate_index[bucket_key] = handle
+            elif type(bucket) is list:
+                bucket.append(handle)
+            else:
+                self.duplicate_index[bucket_key] = [bucket, handle]
+            return
+
+        if type(bucket) is not list:
+            if bucket is not None and self.transactions.fetch(bucket) is transaction:
+                del self.duplicate_index[bucket_key]
+            return
+        for i, match in enumerate(bucket):
+            if self.transactions.fetch(match) is transaction:
+                del bucket[i]
+                break
+        if len(bucket) == 1:
+            self.duplicate_index[bucket_key] = bucket[0]
+
+
+    def find_duplicates(self, transaction, days=DUPLICATE_WINDOW_DAYS):
+        if not transaction['date']:
+            return []
+        day = calendar_date.fromisoformat(transaction['date']).toordinal()
+        key = self.duplicate_key(transaction)
+
+        duplicates = []
+        for offset in range(-days, days + 1):
+            bucket = self.duplicate_index.get(hash((day + offset, key)))
+            if bucket is None:
+                continue
+            for handle in bucket if type(bucket) is list else [bucket]:
+                match = self.transactions.fetch(handle)
+                if match is transaction or self.duplicate_key(match) != key:
+                    continue
+                if calendar_date.fromisoformat(match['date']).toordinal() == day + offset:
+                    duplicates.append(match)
+        return duplicates
+
+
+    def confirm_duplicate(self, transaction, duplicates):
+        duplicate = duplicates[0]
+        message = (
+            f"This looks like transaction {duplicate['index']} "
+            f"({duplicate['date']}, {duplicate['amount']:.2f} {duplicate['currency']}, {duplicate['source']})."
+        )
+        if self.root is None:
+            # Nobody to ask, so add it and report the possible duplicate
+            self.last_warning = message
+            return True
+        return messagebox.askyesno(title="Possible Duplicate", message=f"{message}\n\nAdd it anyway?")
+
+
+    def find_duplicate_candidates(self, days=DUPLICATE_WINDOW_DAYS):
+        # Each transaction is paired with the earlier ledger entries it collides with
+        positions = {self.transactions.row_id(transaction): position for position, transaction in enumerate(self.transactions)}
+        candidates = []
+        for position, transaction in enumerate(self.transactions):
+            for duplicate in self.find_duplicates(transaction, days):
+                if positions[self.transactions.row_id(duplicate)] < position:
+                    gap = abs(calendar_date.fromisoformat(transaction['date']) - calendar_date.fromisoformat(duplicate['date'])).days
+                    candidates.append((duplicate, transaction, gap))
+        return candidates
+
+
+    @writes_ledger
+    def set_budget(self, category, amount):
+        if category not in self.categories:
+            self.show_error(title="Error", message=f"Category '{category}' is not valid.")
+            return False
+
+        try:
+            amount = float(amount)
+            if amount <= 0:
+                self.show_error(title="Error", message="Budget must be greater than zero.")
+                return False
+        except ValueError:
+            self.show_error(title="Error", message="Invalid budget format.")
+            return False
+
+        self.log_operation({'op': 'set_budget', 'category': category, 'before': self.budgets.get(category), 'after': amount})
+        self.budgets[category] = amount
+        self.save_data()
+        return True
+
+
+    def check_budget(self, transaction):
+        if transaction['type'] != 'Expense' or not transaction['date']:
+            return
 
+        budget = self.budgets.get(transaction['category'])
+        if budget is None:
+            return
+
+        month = transaction['date'][:7]
+        try:
+            spent = self.get_month_spending(transaction['category'], month)
+        except ValueError as e:
+            self.show_warning(title="Budget", message=str(e))
+            return
+        if round(spent, 2) > budget:
+            self.show_warning(
+                title="Over Budget",
+                message=f"{transaction['category']} spending for {month} is {spent:.2f} {self.base_currency}, over the {budget:.2f} {self.base_currency} budget."
+            )
+
+
+    def get_budget_status(self, month=None):
+        if month is None:
+            month = datetime.now().strftime("%Y-%m")
+
+        status = []
+        memo = {}
+        for category in sorted(self.budgets):
+            budget = self.budgets[category]
+            spent = self.get_month_spending(category, month, memo)
+            status.append((category, budget, spent, budget - spent))
+        return status
+
+
+    def get_month_spending(self, category, month, memo=None):
+        spent_by_currency = {}
+        for (usage_category, usage_month, currency), amount in self.budget_usage.items():
+            if usage_category == category and usage_month == month:
+                spent_by_currency[currency] = amount
+        # Past months convert at their last day's rate, the current month at today's
+        as_of = min(datetime.now().strftime("%Y-%m-%d"), f"{month}-31")
+        return self.convert_totals(spent_by_currency, as_of, memo)
+
+
+    def load_exchange_rates(self, file_path='rates.csv'):
+        rates = {}
         try:
-            # Create report window with date range in title
-            weekly_report_window = tk.Toplevel(self.root)
-            weekly_report_window.title(f"Weekly Report     {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
-            weekly_report_window.geometry("1000x1000")
-
-            # Initialize tracking variables
-            total_income = 0
-            total_expenses = 0
-            income_by_category = {category: 0.00 for category in self.categories}
-            expenses_by_category = {category: 0.00 for category in self.categories}
-
-            # Process transactions
-            for transaction in self.transactions:
-                transaction_date = datetime.strptime(transaction['date'], "%Y-%m-%d")
-                if start_date <= transaction_date <= end_date:
-                    if transaction['type'] == 'Income':
-                        total_income += transaction['amount']
-                        income_by_category[transaction['category']] += transaction['amount']
-                    else:  # Expense
-                        total_expenses += transaction['amount']
-                        expenses_by_category[transaction['category']] += transaction['amount']
+            with open(file_path, 'r', newline='') as file:
+                for row in csv.DictReader(file):
+                    currency = row['currency'].strip().upper()
+                    rate_date = datetime.strptime(row['date'].strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+                    rates.setdefault(currency, {})[rate_date] = float(row['rate'])
+        except FileNotFoundError:
+            rates = {}
+
+        # Sorted per-currency date lists so a lookup is a bisect, not a scan
+        self.exchange_rates = {
+            currency: (sorted(by_date), [by_date[d] for d in sorted(by_date)])
+            for currency, by_date in rates.items()
+        }
+        return len(rates)
+
+
+    def get_rate(self, currency, as_of):
+        if currency == self.base_currency:
+            return 1.0
+        if self.exchange_rates is None:
+            self.load_exchange_rates()
+
+        dates, rates = self.exchange_rates.get(currency, ([], []))
+        position = bisect_right(dates, as_of)
+        if position == 0:
+            raise ValueError(f"No {currency} exchange rate on or before {as_of}.")
+        return rates[position - 1]
+
+
+    def convert_totals(self, totals_by_currency, as_of, memo=None):
+        # Convert once per currency rather than once per transaction; memo is shared across a report
+        if memo is None:
+            memo = {}
+        total = 0
+        for currency, amount in totals_by_currency.items():
+            if (currency, as_of) not in memo:
+                memo[(currency, as_of)] = self.get_rate(currency, as_of)
+            total += amount * memo[(currency, as_of)]
+        return total
+
+
+    def get_currencies(self):
+        if self.exchange_rates is None:
+            self.load_exchange_rates()
+        return [self.base_currency] + sorted(currency for currency in self.exchange_rates if currency != self.base_currency)
+
+
+    def get_balance_in_base(self):
+        return self.convert_totals(self.balances, datetime.now().strftime("%Y-%m-%d"))
+
+
+    def validate_currency(self, currency):
+        currency = str(currency).strip().upper()
+        if currency == self.base_currency:
+            return currency
+        if self.exchange_rates is None:
+            self.load_exchange_rates()
+        if currency not in self.exchange_rates:
+            self.show_error(title="Error", message=f"No exchange rates are loaded for {currency}.")
+            return None
+        return currency
+
+
+    @writes_ledger
+    def add_rule(self, keyword, category, min_amount=None, max_amount=None):
+        if category not in self.categories:
+            self.show_error(title="Error", message=f"Category '{category}' is not valid.")
+            return False
+
+        try:
+            min_amount = float(min_amount) if min_amount not in (None, "") else None
+            max_amount = float(max_amount) if max_amount not in (None, "") else None
+        except ValueError:
+            self.show_error(title="Error", message="Invalid amount format.")
+            return False
+
+        keyword = (keyword or "").strip()
+        if not keyword and min_amount is None and max_amount is None:
+            self.show_error(title="Error", message="A rule needs a keyword or an amount range.")
+            return False
+
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            self.show_error(title="Error", message="Minimum amount must not be greater than maximum amount.")
+            return False
+
+        rule = {'keyword': keyword, 'category': category, 'min_amount': min_amount, 'max_amount': max_amount}
+        self.rules.append(rule)
+        self.category_matcher = None
+        self.log_operation({'op': 'add_rule', 'position': len(self.rules) - 1, 'rule': dict(rule)})
+        self.save_data()
+        return True
+
+
+    @writes_ledger
+    def remove_rule(self, position):
+        if position < 0 or position >= len(self.rules):
+            self.show_error(title="Error", message="Invalid rule selected.")
+            return False
+
+        rule = self.rules.pop(position)
+        self.category_matcher = None
+        self.log_operation({'op': 'remove_rule', 'position': position, 'rule': rule})
+        self.save_data()
+        return True
+
+
+    def categorize(self, source, amount):
+        # The automaton is rebuilt only after the rules change
+        if self.category_matcher is None:
+            self.category_matcher = CategoryMatcher(self.rules)
+        return self.category_matcher.match(source, amount)
+
+
+    @writes_ledger
+    def recategorize_transactions(self):
+        # Applies the current rules to the whole ledger and saves once at the end
+        operations = []
+        for position, transaction in enumerate(self.transactions):
+            category = self.categorize(transaction['source'], transaction['amount'])
+            if category is None or category == transaction['category']:
+                continue
+
+            before = dict(transaction)
+            self.track_transaction(transaction, -1)
+            transaction['category'] = category
+            self.transactions.write(transaction)
+            self.track_transaction(transaction, 1)
+            operations.append({'op': 'update', 'position': position, 'before': before, 'after': dict(transaction)})
+
+        if operations:
+            self.log_operations(operations)
+            self.save_data()
+        return len(operations)
+
+
+    @writes_ledger
+    def import_transactions(self, file_path):
+        # Bulk import of a bank statement CSV with date, amount, source and
+        # optionally type, category and currency columns. Rows without a
+        # category are categorized by the rules, falling back to 'Other'.
+        operations = []
+        skipped = 0
+        duplicates = 0
+        imported = set()
+        if self.exchange_rates is None:
+            self.load_exchange_rates()
+
+        with open(file_path, newline='') as file:
+            for row in csv.DictReader(file):
+                row = {(name or '').strip().lower(): (value or '').strip() for name, value in row.items()}
+                try:
+                    amount = round(float(row['amount']), 2)
+                    date = datetime.strptime(row['date'], "%Y-%m-%d").strftime("%Y-%m-%d")
+                except (KeyError, ValueError):
+                    skipped += 1
+                    continue
+
+                transaction_type = row.get('type') or ('Expense' if amount < 0 else 'Income')
+                amount = abs(amount)
+                source = row.get('source', '')
+                category = row.get('category') or self.categorize(source, amount) or 'Other'
+                currency = (row.get('currency') or self.base_currency).upper()
+
+                if amount == 0 or transaction_type not in ['Income', 'Expense'] or category not in self.categories:
+                    skipped += 1
+                    continue
+                if currency != self.base_currency and currency not in self.exchange_rates:
+                    skipped += 1
+                    continue
+
+                transaction = {
+                    'amount': amount,
+                    'currency': currency,
+                    'category': category,
+                    'date': date,
+                    'type': transaction_type,
+                    'source': source,
+                    'index': len(self.transactions)
+                }
+
+                # A same-day match that was already in the ledger means an
+                # overlapping statement. Repeats within this file are kept, and
+                # near matches on other days are left for the duplicate review.
+                if any(match['date'] == date and self.transactions.row_id(match) not in imported for match in self.find_duplicates(transaction, days=0)):
+                    duplicates += 1
+                    continue
+
+                transaction = self.transactions.add_row(transaction)
+                imported.add(self.transactions.row_id(transaction))
+                self.track_transaction(transaction, 1)
+                operations.append({'op': 'add', 'position': len(self.transactions) - 1, 'before': None, 'after': dict(transaction)})
+
+        if operations:
+            self.log_operations(operations)
+            self.save_data()
+        return len(operations), skipped, duplicates
+
+
+    def get_report_period(self, period):
+        end_date = datetime.now()
+        if period == 'weekly':
+            start_date = end_date - timedelta(weeks=1)
+        else:  # monthly
+            start_date = end_date.replace(day=1)  # First day of current month
+        return start_date, end_date
+
+
+    def calculate_report(self, start_date, end_date):
+        income_by_category = {category: 0.00 for category in self.categories}
+        expenses_by_category = {category: 0.00 for category in self.categories}
+
+        first_day, last_day = day_bounds(start_date, end_date)
+
+        # Answered from the per-day totals without reading a transaction. Each
+        # group is summed per currency first and converted once at the end date.
+        grouped = {}
+        for day, day_totals in self.daily_totals.items():
+            if not first_day <= day <= last_day:
+                continue
+            for (transaction_type, category, currency), (amount, count) in day_totals.items():
+                totals = grouped.setdefault((transaction_type, category), {})
+                totals[currency] = totals.get(currency, 0) + amount
+
+        as_of = end_date.strftime("%Y-%m-%d")
+        memo = {}
+        for (transaction_type, category), totals in grouped.items():
+            amount = self.convert_totals(totals, as_of, memo)
+            if transaction_type == 'Income':
+                income_by_category[category] = income_by_category.get(category, 0) + amount
+            else:  # Expense
+                expenses_by_category[category] = expenses_by_category.get(category, 0) + amount
+
+        total_income = sum(income_by_category.values())
+        total_expenses = sum(expenses_by_category.values())
+        return total_income, total_expenses, income_by_category, expenses_by_category
+
+
+    def get_weekly_summary(self):
+        self.show_period_report("weekly_report", "Weekly Report", "WEEKLY SUMMARY", 'weekly')
+
+
+    def get_monthly_summary(self):
+        self.show_period_report("monthly_report", "Monthly Report", "MONTHLY SUMMARY", 'monthly')
+
 
+    def show_period_report(self, name, title, heading, period):
+        def build(report_window):
             # Create frame for the report
-            frame = tk.Frame(weekly_report_window)
+            frame = tk.Frame(report_window)
             frame.pack(fill='both', expand=True)
 
-            # Create Treeview with style
-            style = ttk.Style()
-            style.configure("Bold.Treeview", font=('Helvetica', 10, 'bold'))
-
             tree = ttk.Treeview(frame, columns=("Category", "Amount"), show="headings", style="Bold.Treeview")
             tree.heading("Category", text="Category")
             tree.heading("Amount", text="Amount")
 
-            # Add summary section with bold text
-            tree.insert("", tk.END, values=("WEEKLY SUMMARY", ""))
-            tree.insert("", tk.END, values=("TOTAL INCOME", f"${total_income:.2f}"))
-            tree.insert("", tk.END, values=("TOTAL EXPENSES", f"${total_expenses:.2f}"))
-            tree.insert("", tk.END, values=("NET BALANCE", f"${total_income - total_expenses:.2f}"))
-            tree.insert("", tk.END, values=("", ""))
-
-            # Add income breakdown with bold header
-            tree.insert("", tk.END, values=("INCOME BREAKDOWN", ""))
-            for category in sorted(self.categories):
-                tree.insert("", tk.END, values=(category, f"${income_by_category[category]:.2f}"))
-            tree.insert("", tk.END, values=("", ""))
-
-            # Add expense breakdown with bold header
-            tree.insert("", tk.END, values=("EXPENSE BREAKDOWN", ""))
-            for category in sorted(self.categories):
-                tree.insert("", tk.END, values=(category, f"${expenses_by_category[category]:.2f}"))
-
             # Add horizontal scrollbar
             hsb = ttk.Scrollbar(frame, orient="horizontal", command=tree.xview)
             hsb.pack(side='bottom', fill='x')
@@ -300,325 +1982,700 @@ class FinanceTracker:
             tree.configure(xscrollcommand=hsb.set)
             tree.pack(fill='both', expand=True)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
+            def refresh():
+                start_date, end_date = self.get_report_period(period)
 
+                try:
+                    # Report window with date range in title
+                    report_window.title(f"{title}     {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
-    def get_monthly_summary(self):
-        end_date = datetime.now()
-        start_date = end_date.replace(day=1)  # First day of current month
+                    total_income, total_expenses, income_by_category, expenses_by_category = self.calculate_report(start_date, end_date)
 
-        try:
-            # Create report window with date range in title
-            monthly_report_window = tk.Toplevel(self.root)
-            monthly_report_window.title(f"Monthly Report     {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
-            monthly_report_window.geometry("1000x1000")
-
-            # Initialize tracking variables
-            total_income = 0
-            total_expenses = 0
-            income_by_category = {category: 0.00 for category in self.categories}
-            expenses_by_category = {category: 0.00 for category in self.categories}
-
-            # Process transactions
-            for transaction in self.transactions:
-                transaction_date = datetime.strptime(transaction['date'], "%Y-%m-%d")
-                if start_date <= transaction_date <= end_date:
-                    if transaction['type'] == 'Income':
-                        total_income += transaction['amount']
-                        income_by_category[transaction['category']] += transaction['amount']
-                    else:  # Expense
-                        total_expenses += transaction['amount']
-                        expenses_by_category[transaction['category']] += transaction['amount']
+                    tree.delete(*tree.get_children())
 
-            # Create frame for the report
-            frame = tk.Frame(monthly_report_window)
+                    # Add summary section with bold text
+                    tree.insert("", tk.END, values=(heading, ""))
+                    currency = self.base_currency
+                    tree.insert("", tk.END, values=("TOTAL INCOME", f"{total_income:.2f} {currency}"))
+                    tree.insert("", tk.END, values=("TOTAL EXPENSES", f"{total_expenses:.2f} {currency}"))
+                    tree.insert("", tk.END, values=("NET BALANCE", f"{total_income - total_expenses:.2f} {currency}"))
+                    tree.insert("", tk.END, values=("", ""))
+
+                    # Add income breakdown with bold header
+                    tree.insert("", tk.END, values=("INCOME BREAKDOWN", ""))
+                    for category in sorted(self.categories):
+                        tree.insert("", tk.END, values=(category, f"{income_by_category[category]:.2f} {currency}"))
+                    tree.insert("", tk.END, values=("", ""))
+
+                    # Add expense breakdown with bold header
+                    tree.insert("", tk.END, values=("EXPENSE BREAKDOWN", ""))
+                    for category in sorted(self.categories):
+                        tree.insert("", tk.END, values=(category, f"{expenses_by_category[category]:.2f} {currency}"))
+
+                except Exception as e:
+                    messagebox.showerror("Error", f"An error occurred: {e}")
+
+            return refresh
+
+        self.windows.show(name, title, build, live=True)
+
+
+    def add_transaction_gui(self):
+        def build(add_transaction_window):
+            def submit_transaction():
+                amount = amount_entry.get()
+                category = category_var.get()
+                date = date_entry.get()
+                transaction_type = type_var.get()
+                source = source_entry.get()
+                currency = currency_var.get()
+
+                if not all([amount, category, date, transaction_type, source]):
+                    messagebox.showerror(title="Error", message="Please fill in all fields.")
+                    return
+
+                # If add_transaction returns True, then show success message and close window
+                if self.add_transaction(amount, category, date, transaction_type, source, currency):
+                    messagebox.showinfo(title="Success", message="Transaction added successfully.")
+                    add_transaction_window.withdraw()
+
+            amount_label = tk.Label(add_transaction_window, text="Amount:")
+            amount_label.grid(row=0, column=0, padx=5, pady=5)
+
+            amount_entry = tk.Entry(add_transaction_window)
+            amount_entry.grid(row=0, column=1, padx=5, pady=5)
+
+            category_label = tk.Label(add_transaction_window, text="Category:")
+            category_label.grid(row=1, column=0, padx=5, pady=5)
+
+            category_var = tk.StringVar(add_transaction_window)
+            category_var.set("")
+
+            category_dropdown = ttk.Combobox(
+                add_transaction_window,
+                textvariable=category_var,
+                values=list(self.categories),
+                state="readonly"
+            )
+            category_dropdown.grid(row=1, column=1, padx=5, pady=5)
+
+            date_label = tk.Label(add_transaction_window, text="Date (YYYY-MM-DD):")
+            date_label.grid(row=2, column=0, padx=5, pady=5)
+
+            date_entry = tk.Entry(add_transaction_window)
+            date_entry.grid(row=2, column=1, padx=5, pady=5)
+
+            type_label = tk.Label(add_transaction_window, text="Type:")
+            type_label.grid(row=3, column=0, padx=5, pady=5)
+
+            type_var = tk.StringVar(add_transaction_window)
+            type_var.set("")
+
+            type_dropdown = ttk.Combobox(
+                add_transaction_window,
+                textvariable=type_var,
+                values=["Income", "Expense"],
+                state="readonly"
+            )
+            type_dropdown.grid(row=3, column=1, padx=5, pady=5)
+
+            source_label = tk.Label(add_transaction_window, text="Source:")
+            source_label.grid(row=4, column=0, padx=5, pady=5)
+
+            source_entry = tk.Entry(add_transaction_window)
+            source_entry.grid(row=4, column=1, padx=5, pady=5)
+
+            currency_label = tk.Label(add_transaction_window, text="Currency:")
+            currency_label.grid(row=5, column=0, padx=5, pady=5)
+
+            currency_var = tk.StringVar(add_transaction_window)
+
+            currency_dropdown = ttk.Combobox(
+                add_transaction_window,
+                textvariable=currency_var,
+                values=self.get_currencies(),
+                state="readonly"
+            )
+            currency_dropdown.grid(row=5, column=1, padx=5, pady=5)
+
+            index_label = tk.Label(add_transaction_window)
+            index_label.grid(row=6, column=0, padx=5, pady=5)
+
+            submit_button = tk.Button(add_transaction_window, text="Submit", command=submit_transaction)
+            submit_button.grid(row=7, column=0, columnspan=2, padx=5, pady=5)
+
+            def refresh():
+                for entry in (amount_entry, date_entry, source_entry):
+                    entry.delete(0, tk.END)
+                category_var.set("")
+                type_var.set("")
+                currency_var.set(self.base_currency)
+                category_dropdown.config(values=list(self.categories))
+                currency_dropdown.config(values=self.get_currencies())
+                index_label.config(text=f"Transaction Index: {len(self.transactions)}")
+
+            return refresh
+
+        self.windows.show("add_transaction", "Add Transaction", build)
+
+    
+    def view_balance_gui(self):
+        def build(balance_window):
+            # Create frame for the display
+            frame = tk.Frame(balance_window)
             frame.pack(fill='both', expand=True)
 
-            # Create Treeview with style
-            style = ttk.Style()
-            style.configure("Bold.Treeview", font=('Helvetica', 10, 'bold'))
+            tree = ttk.Treeview(frame, columns=("Item", "Amount"), show="headings", style="Bold.Treeview")
+            tree.heading("Item", text="Item")
+            tree.heading("Amount", text="Amount")
 
-            tree = ttk.Treeview(frame, columns=("Category", "Amount"), show="headings", style="Bold.Treeview")
+            tree.pack(fill='both', expand=True)
+
+            def refresh():
+                tree.delete(*tree.get_children())
+                try:
+                    total = f"{self.get_balance_in_base():.2f} {self.base_currency}"
+                except ValueError as e:
+                    total = str(e)
+                # Insert balance with bold formatting
+                tree.insert("", tk.END, values=("Current Balance", total))
+                for currency in sorted(self.balances):
+                    tree.insert("", tk.END, values=(f"  in {currency}", f"{self.balances[currency]:.2f} {currency}"))
+
+            return refresh
+
+        self.windows.show("balance", "Current Balance", build, live=True)
+
+
+    def view_budgets_gui(self):
+        def build(budget_window):
+            frame = tk.Frame(budget_window)
+            frame.pack(fill='both', expand=True)
+
+            tree = ttk.Treeview(frame, columns=("Category", "Budget", "Spent", "Remaining"), show="headings")
             tree.heading("Category", text="Category")
-            tree.heading("Amount", text="Amount")
+            tree.heading("Budget", text="Budget")
+            tree.heading("Spent", text="Spent")
+            tree.heading("Remaining", text="Remaining")
+            tree.pack(fill='both', expand=True)
+
+            def refresh():
+                month = datetime.now().strftime("%Y-%m")
+                budget_window.title(f"Budget Status     {month}")
+
+                # Rendered from the running counters, the transactions themselves are never read
+                tree.delete(*tree.get_children())
+                currency = self.base_currency
+                for category, budget, spent, remaining in self.get_budget_status(month):
+                    tree.insert("", tk.END, values=(
+                        category,
+                        f"{budget:.2f} {currency}",
+                        f"{spent:.2f} {currency}",
+                        f"{remaining:.2f} {currency}" if remaining >= 0 else f"{-remaining:.2f} {currency} OVER"
+                    ))
+
+            return refresh
+
+        self.windows.show("budgets", "Budget Status", build, live=True)
+
+
+    def set_budget_gui(self):
+        def build(set_budget_window):
+            def submit_budget():
+                category = category_var.get()
+                amount = amount_entry.get()
+
+                if not category or not amount:
+                    messagebox.showerror(title="Error", message="Please fill in all fields.")
+                    return
+
+                if self.set_budget(category, amount):
+                    messagebox.showinfo(title="Success", message=f"Budget for {category} set successfully.")
+                    set_budget_window.withdraw()
+
+            category_label = tk.Label(set_budget_window, text="Category:")
+            category_label.grid(row=0, column=0, padx=5, pady=5)
+
+            category_var = tk.StringVar(set_budget_window)
+            category_var.set("")
+
+            category_dropdown = ttk.Combobox(
+                set_budget_window,
+                textvariable=category_var,
+                values=list(self.categories),
+                state="readonly"
+            )
+            category_dropdown.grid(row=0, column=1, padx=5, pady=5)
+
+            amount_label = tk.Label(set_budget_window, text="Monthly Budget:")
+            amount_label.grid(row=1, column=0, padx=5, pady=5)
+
+            amount_entry = tk.Entry(set_budget_window)
+            amount_entry.grid(row=1, column=1, padx=5, pady=5)
+
+            submit_button = tk.Button(set_budget_window, text="Submit", command=submit_budget)
+            submit_button.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+
+            def refresh():
+                category_var.set("")
+                category_dropdown.config(values=list(self.categories))
+                amount_entry.delete(0, tk.END)
+
+            return refresh
+
+        self.windows.show("set_budget", "Set Budget", build)
+
+
+    def rules_gui(self):
+        def build(rules_window):
+            def show_rules():
+                tree.delete(*tree.get_children())
+                for position, rule in enumerate(self.rules):
+                    tree.insert("", tk.END, iid=str(position), values=(
+                        rule['keyword'],
+                        "" if rule['min_amount'] is None else f"${rule['min_amount']:.2f}",
+                        "" if rule['max_amount'] is None else f"${rule['max_amount']:.2f}",
+                        rule['category']
+                    ))
+
+            def submit_rule():
+                if not category_var.get():
+                    messagebox.showerror(title="Error", message="Please select a category.")
+                    return
+
+                if self.add_rule(keyword_entry.get(), category_var.get(), min_entry.get().strip(), max_entry.get().strip()):
+                    keyword_entry.delete(0, tk.END)
+                    min_entry.delete(0, tk.END)
+                    max_entry.delete(0, tk.END)
+                    show_rules()
+
+            def remove_rule():
+                selected = tree.selection()
+                if not selected:
+                    messagebox.showerror(title="Error", message="Please select a rule to remove.")
+                    return
+
+                if self.remove_rule(int(selected[0])):
+                    show_rules()
+
+            def recategorize():
+                changed = self.recategorize_transactions()
+                messagebox.showinfo(title="Success", message=f"{changed} transactions re-categorized.")
+
+            form_frame = tk.Frame(rules_window)
+            form_frame.pack(pady=5)
+
+            keyword_label = tk.Label(form_frame, text="Source contains:")
+            keyword_label.grid(row=0, column=0, padx=5, pady=5)
+
+            keyword_entry = tk.Entry(form_frame)
+            keyword_entry.grid(row=0, column=1, padx=5, pady=5)
+
+            min_label = tk.Label(form_frame, text="Min Amount:")
+            min_label.grid(row=1, column=0, padx=5, pady=5)
+
+            min_entry = tk.Entry(form_frame)
+            min_entry.grid(row=1, column=1, padx=5, pady=5)
+
+            max_label = tk.Label(form_frame, text="Max Amount:")
+            max_label.grid(row=2, column=0, padx=5, pady=5)
+
+            max_entry = tk.Entry(form_frame)
+            max_entry.grid(row=2, column=1, padx=5, pady=5)
 
-            # Add summary section with bold text
-            tree.insert("", tk.END, values=("MONTHLY SUMMARY", ""))
-            tree.insert("", tk.END, values=("TOTAL INCOME", f"${total_income:.2f}"))
-            tree.insert("", tk.END, values=("TOTAL EXPENSES", f"${total_expenses:.2f}"))
-            tree.insert("", tk.END, values=("NET BALANCE", f"${total_income - total_expenses:.2f}"))
-            tree.insert("", tk.END, values=("", ""))
+            category_label = tk.Label(form_frame, text="Category:")
+            category_label.grid(row=3, column=0, padx=5, pady=5)
 
-            # Add income breakdown with bold header
-            tree.insert("", tk.END, values=("INCOME BREAKDOWN", ""))
-            for category in sorted(self.categories):
-                tree.insert("", tk.END, values=(category, f"${income_by_category[category]:.2f}"))
-            tree.insert("", tk.END, values=("", ""))
+            category_var = tk.StringVar(rules_window)
+            category_var.set("")
 
-            # Add expense breakdown with bold header
-            tree.insert("", tk.END, values=("EXPENSE BREAKDOWN", ""))
-            for category in sorted(self.categories):
-                tree.insert("", tk.END, values=(category, f"${expenses_by_category[category]:.2f}"))
+            category_dropdown = ttk.Combobox(
+                form_frame,
+                textvariable=category_var,
+                values=list(self.categories),
+                state="readonly"
+            )
+            category_dropdown.grid(row=3, column=1, padx=5, pady=5)
 
-            # Add horizontal scrollbar
-            hsb = ttk.Scrollbar(frame, orient="horizontal", command=tree.xview)
-            hsb.pack(side='bottom', fill='x')
+            add_button = tk.Button(form_frame, text="Add Rule", command=submit_rule)
+            add_button.grid(row=4, column=0, columnspan=2, padx=5, pady=5)
 
-            # Configure the Treeview to use scrollbar
-            tree.configure(xscrollcommand=hsb.set)
+            # Rules are checked top to bottom, the first one that matches wins
+            tree = ttk.Treeview(rules_window, columns=("Keyword", "Min", "Max", "Category"), show="headings", selectmode="browse")
+            tree.heading("Keyword", text="Source contains")
+            tree.heading("Min", text="Min Amount")
+            tree.heading("Max", text="Max Amount")
+            tree.heading("Category", text="Category")
             tree.pack(fill='both', expand=True)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-
+            button_frame = tk.Frame(rules_window)
+            button_frame.pack(pady=5)
 
+            remove_button = tk.Button(button_frame, text="Remove Rule", command=remove_rule)
+            remove_button.pack(side='left', padx=5)
 
-    def add_transaction_gui(self):
-        def submit_transaction():
-            amount = amount_entry.get()
-            category = category_var.get()
-            date = date_entry.get()
-            transaction_type = type_var.get()
-            source = source_entry.get()
-
-            if not all([amount, category, date, transaction_type, source]):
-                messagebox.showerror(title="Error", message="Please fill in all fields.")
-                return
+            recategorize_button = tk.Button(button_frame, text="Re-categorize All Transactions", command=recategorize)
+            recategorize_button.pack(side='left', padx=5)
 
-            # If add_transaction returns True, then show success message and close window
-            if self.add_transaction(amount, category, date, transaction_type, source):
-                messagebox.showinfo(title="Success", message="Transaction added successfully.")
-                add_transaction_window.destroy()
+            def refresh():
+                category_dropdown.config(values=list(self.categories))
+                show_rules()
 
-        add_transaction_window = tk.Toplevel(self.root)
-        add_transaction_window.title("Add Transaction")
-        add_transaction_window.geometry("1000x1000")
+            return refresh
 
-        amount_label = tk.Label(add_transaction_window, text="Amount:")
-        amount_label.grid(row=0, column=0, padx=5, pady=5)
+        self.windows.show("rules", "Categorization Rules", build)
 
-        amount_entry = tk.Entry(add_transaction_window)
-        amount_entry.grid(row=0, column=1, padx=5, pady=5)
 
-        category_label = tk.Label(add_transaction_window, text="Category:")
-        category_label.grid(row=1, column=0, padx=5, pady=5)
+    def import_transactions_gui(self):
+        file_path = filedialog.askopenfilename(
+            parent=self.root,
+            title="Import Transactions",
+            filetypes=[("CSV", "*.csv")]
+        )
+        if not file_path:
+            return
 
-        category_var = tk.StringVar(add_transaction_window)
-        category_var.set("")
+        try:
+            imported, skipped, duplicates = self.import_transactions(file_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"An error occurred: {e}")
+            return
 
-        category_dropdown = ttk.Combobox(
-            add_transaction_window,
-            textvariable=category_var,
-            values=list(self.categories),
-            state="readonly"
+        messagebox.showinfo(
+            title="Import Complete",
+            message=f"{imported} transactions imported, {skipped} rows skipped, {duplicates} duplicates skipped."
         )
-        category_dropdown.grid(row=1, column=1, padx=5, pady=5)
 
-        date_label = tk.Label(add_transaction_window, text="Date (YYYY-MM-DD):")
-        date_label.grid(row=2, column=0, padx=5, pady=5)
 
-        date_entry = tk.Entry(add_transaction_window)
-        date_entry.grid(row=2, column=1, padx=5, pady=5)
+    def row_cache_gui(self):
+        if self.row_cache_size is None:
+            messagebox.showinfo(title="Row Cache", message="All transactions are held in memory. Start with --row-cache to page them from disk.")
+            return
 
-        type_label = tk.Label(add_transaction_window, text="Type:")
-        type_label.grid(row=3, column=0, padx=5, pady=5)
+        stats = self.transactions.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = f"{100 * stats['hits'] / lookups:.1f}%" if lookups else "n/a"
+        messagebox.showinfo(
+            title="Row Cache",
+            message=(
+                f"{stats['cached']} of {stats['cache_size']} rows cached, {stats['rows']} transactions on disk.\n"
+                f"Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {hit_rate}\n"
+                f"Evictions: {stats['evictions']}"
+            )
+        )
 
-        type_var = tk.StringVar(add_transaction_window)
-        type_var.set("")
 
-        type_dropdown = ttk.Combobox(
-            add_transaction_window,
-            textvariable=type_var,
-            values=["Income", "Expense"],
-            state="readonly"
+    def load_exchange_rates_gui(self):
+        file_path = filedialog.askopenfilename(
+            parent=self.root,
+            title="Load Exchange Rates",
+            filetypes=[("CSV", "*.csv")]
         )
-        type_dropdown.grid(row=3, column=1, padx=5, pady=5)
+        if not file_path:
+            return
 
-        source_label = tk.Label(add_transaction_window, text="Source:")
-        source_label.grid(row=4, column=0, padx=5, pady=5)
+        try:
+            currencies = self.load_exchange_rates(file_path)
+        except (OSError, KeyError, ValueError) as e:
+            messagebox.showerror("Error", f"An error occurred: {e}")
+            return
 
-        source_entry = tk.Entry(add_transaction_window)
-        source_entry.grid(row=4, column=1, padx=5, pady=5)
+        messagebox.showinfo(title="Exchange Rates", message=f"Rates loaded for {currencies} currencies.")
+        self.notify('reloaded', None)
+        self.data_changed()
 
-        index_label = tk.Label(add_transaction_window, text=f"Transaction Index: {len(self.transactions)}")
-        index_label.grid(row=5, column=0, padx=5, pady=5)
 
-        submit_button = tk.Button(add_transaction_window, text="Submit", command=submit_transaction)
-        submit_button.grid(row=6, column=0, columnspan=2, padx=5, pady=5)
+    def review_duplicates_gui(self):
+        def build(review_window):
+            def refresh():
+                tree.delete(*tree.get_children())
+                for original, duplicate, gap in self.find_duplicate_candidates():
+                    tree.insert("", tk.END, values=(
+                        duplicate['index'],
+                        duplicate['date'],
+                        duplicate['amount'],
+                        duplicate['type'],
+                        duplicate['source'],
+                        original['index'],
+                        gap
+                    ))
 
-    
-    def view_balance_gui(self):
-        balance_window = tk.Toplevel(self.root)
-        balance_window.title("Current Balance")
-        balance_window.geometry("1000x1000")
+            def delete_selected():
+                selected = tree.selection()
+                if not selected:
+                    messagebox.showerror(title="Error", message="Please select a transaction to delete.")
+                    return
 
-        # Create frame for the display
-        frame = tk.Frame(balance_window)
-        frame.pack(fill='both', expand=True)
+                for index in {int(tree.item(item)['values'][0]) for item in selected}:
+                    self.delete_transaction(index)
+                refresh()
 
-        # Create Treeview with style
-        style = ttk.Style()
-        style.configure("Bold.Treeview", font=('Helvetica', 10, 'bold'))
+            tree = ttk.Treeview(
+                review_window,
+                columns=("Index", "Date", "Amount", "Type", "Source", "Duplicate Of", "Days Apart"),
+                show="headings"
+            )
+            tree.heading("Index", text="Index")
+            tree.heading("Date", text="Date")
+            tree.heading("Amount", text="Amount")
+            tree.heading("Type", text="Type")
+            tree.heading("Source", text="Source")
+            tree.heading("Duplicate Of", text="Duplicate Of")
+            tree.heading("Days Apart", text="Days Apart")
+            tree.pack(fill='both', expand=True)
 
-        tree = ttk.Treeview(frame, columns=("Item", "Amount"), show="headings", style="Bold.Treeview")
-        tree.heading("Item", text="Item")
-        tree.heading("Amount", text="Amount")
+            delete_button = tk.Button(review_window, text="Delete Selected", command=delete_selected)
+            delete_button.pack(pady=5)
 
-        # Insert balance with bold formatting
-        tree.insert("", tk.END, values=("Current Balance", f"${self.balance:.2f}"))
+            return refresh
 
-        tree.pack(fill='both', expand=True)
+        self.windows.show("review_duplicates", "Review Duplicates", build, live=True)
 
 
     def generate_summary_gui(self):
-        def submit_summary():
-            start_date = start_date_entry.get()
-            end_date = end_date_entry.get()
+        def build(summary_window):
+            def submit_summary():
+                start_date = start_date_entry.get()
+                end_date = end_date_entry.get()
 
-            if not start_date or not end_date:
-                messagebox.showerror(title="Error", message="Please fill in both start and end dates.")
-                return
+                if not start_date or not end_date:
+                    messagebox.showerror(title="Error", message="Please fill in both start and end dates.")
+                    return
 
-            start_formatted_date = self.format_date(start_date)
-            end_formatted_date = self.format_date(end_date)
+                start_formatted_date = self.format_date(start_date)
+                end_formatted_date = self.format_date(end_date)
 
-            if not start_formatted_date or not end_formatted_date:
-                return
+                if not start_formatted_date or not end_formatted_date:
+                    return
 
-            start_date_obj = datetime.strptime(start_formatted_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_formatted_date, "%Y-%m-%d")
+                start_date_obj = datetime.strptime(start_formatted_date, "%Y-%m-%d")
+                end_date_obj = datetime.strptime(end_formatted_date, "%Y-%m-%d")
 
-            # Check if start date is older than end date
-            if start_date_obj >= end_date_obj:
-                messagebox.showerror(title="Error", message="Start date must be older than end date.")
-                return
+                # Check if start date is older than end date
+                if start_date_obj >= end_date_obj:
+                    messagebox.showerror(title="Error", message="Start date must be older than end date.")
+                    return
+
+                self.show_transaction_results(
+                    "summary_results",
+                    "Summary",
+                    f"Summary from {start_date_obj.date()} to {end_date_obj.date()}:",
+                    start_date=start_date_obj,
+                    end_date=end_date_obj
+                )
+
+            start_date_label = tk.Label(summary_window, text="Start Date (YYYY-MM-DD):")
+            start_date_label.grid(row=0, column=0, padx=5, pady=5)
+
+            start_date_entry = tk.Entry(summary_window)
+            start_date_entry.grid(row=0, column=1, padx=5, pady=5)
+
+            end_date_label = tk.Label(summary_window, text="End Date (YYYY-MM-DD):")
+            end_date_label.grid(row=1, column=0, padx=5, pady=5)
+
+            end_date_entry = tk.Entry(summary_window)
+            end_date_entry.grid(row=1, column=1, padx=5, pady=5)
 
-            summary_text = self.generate_summary(start_date_obj, end_date_obj)
-            summary_window = tk.Toplevel(self.root)
-            summary_window.title("Summary")
-            summary_window.geometry("1000x1000") 
+            submit_button = tk.Button(summary_window, text="Submit", command=submit_summary)
+            submit_button.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
 
-            summary_label = tk.Label(summary_window, text=f"Summary from {start_date_obj.date()} to {end_date_obj.date()}:")
-            summary_label.pack()
+        self.windows.show("choose_dates", "Choose Dates", build)
+
+
+    def show_transaction_results(self, name, title, label_text, approximate=False, **filters):
+        # The same results window is reused for every query. It remembers the
+        # last filters so it can re-run them when the ledger changes.
+        self.result_filters[name] = (label_text, filters, approximate)
+
+        def build(results_window):
+            results_label = tk.Label(results_window)
+            results_label.pack()
 
             # Create Treeview to display transactions
-            tree = ttk.Treeview(summary_window, columns=("Amount", "Category", "Date", "Type", "Source"), show="headings")
+            tree = ttk.Treeview(results_window, columns=("Amount", "Currency", "Category", "Date", "Type", "Source"), show="headings")
             tree.heading("Amount", text="Amount")
+            tree.heading("Currency", text="Currency")
             tree.heading("Category", text="Category")
             tree.heading("Date", text="Date")
             tree.heading("Type", text="Type")
             tree.heading("Source", text="Source")
+            tree.pack()
 
-            filtered_transactions = self.filter_transactions(start_date=start_date_obj, end_date=end_date_obj)
-            for transaction in filtered_transactions:
-                tree.insert("", tk.END, values=(
-                    transaction['amount'],
-                    transaction['category'],
-                    transaction['date'],
-                    transaction['type'],
-                    transaction['source']
-                ))
+            query = {'generation': 0}
 
-            tree.pack()
-            summary_window.mainloop()
+            def insert_rows(transactions):
+                for transaction in transactions:
+                    tree.insert("", tk.END, values=(
+                        transaction['amount'],
+                        transaction['currency'],
+                        transaction['category'],
+                        transaction['date'],
+                        transaction['type'],
+                        transaction['source']
+                    ))
 
-        summary_window = tk.Toplevel(self.root)
-        summary_window.title("Choose Dates")
-        summary_window.geometry("1000x1000")
+            def fill_exact(future, generation, label_text, as_of):
+                # A newer query replaces this one, its late result is dropped
+                if generation != query['generation']:
+                    return
+                if not future.done():
+                    self.root.after(EXACT_POLL_INTERVAL_MS, fill_exact, future, generation, label_text, as_of)
+                    return
 
-        start_date_label = tk.Label(summary_window, text="Start Date (YYYY-MM-DD):")
-        start_date_label.grid(row=0, column=0, padx=5, pady=5)
+                matches = future.result()
+                insert_rows(matches)
+                totals = {}
+                for transaction in matches:
+                    totals[transaction['currency']] = totals.get(transaction['currency'], 0) + transaction['amount']
+                try:
+                    total = f"{self.convert_totals(totals, as_of):.2f} {self.base_currency}"
+                except ValueError as e:
+                    total = str(e)
+                lines = [label_text] if label_text else []
+                lines.append(f"{len(matches)} transactions, total {total} (exact)")
+                results_label.config(text="\n".join(lines))
+
+            def refresh():
+                label_text, filters, approximate = self.result_filters[name]
+                query['generation'] += 1
+                tree.delete(*tree.get_children())
+
+                if not approximate:
+                    results_label.config(text=label_text)
+                    insert_rows(self.iter_transactions(**filters))
+                    return
 
-        start_date_entry = tk.Entry(summary_window)
-        start_date_entry.grid(row=0, column=1, padx=5, pady=5)
+                lines = [label_text] if label_text else []
+                try:
+                    estimate = self.estimate_transactions(**filters)
+                    lines.append(
+                        f"\u2248 {estimate['count']:.0f} \u00b1 {estimate['count_error']:.0f} transactions, "
+                        f"total \u2248 {estimate['total']:.2f} \u00b1 {estimate['total_error']:.2f} {self.base_currency}"
+                    )
+                    for currency, (median, p90) in estimate['quantiles'].items():
+                        lines.append(f"Median \u2248 {median:.2f} {currency}, 90th percentile \u2248 {p90:.2f} {currency}")
+                    if estimate['top_sources']:
+                        lines.append("Top sources: " + ", ".join(
+                            f"{source} ({max(count - error, 0)}-{count})" if error else f"{source} ({count})"
+                            for source, count, error in estimate['top_sources']
+                        ))
+                except ValueError as e:
+                    lines.append(str(e))
+                lines.append("Loading exact results...")
+                results_label.config(text="\n".join(lines))
+
+                # The exact rows are gathered off the Tk thread over a detached copy of the ledger
+                if self.query_executor is None:
+                    self.query_executor = ThreadPoolExecutor(max_workers=1)
+                rows = self.transactions.detached(copy_rows=False)
+                future = self.query_executor.submit(lambda: list(self.iter_transactions(transactions=rows, **filters)))
+                as_of = (filters.get('end_date') or datetime.now()).strftime("%Y-%m-%d")
+                fill_exact(future, query['generation'], label_text, as_of)
+
+            return refresh
+
+        self.windows.show(name, title, build, live=True)
 
-        end_date_label = tk.Label(summary_window, text="End Date (YYYY-MM-DD):")
-        end_date_label.grid(row=1, column=0, padx=5, pady=5)
 
-        end_date_entry = tk.Entry(summary_window)
-        end_date_entry.grid(row=1, column=1, padx=5, pady=5)
+    def update_transaction_gui(self):
+        def build(update_transaction_window):
+            def update_transaction():
+                index = index_entry.get()
+                new_amount = amount_entry.get()
+                new_category = category_var.get()
+                new_date = date_entry.get()
+                new_type = type_var.get()
+                new_currency = currency_var.get()
+
+                if not all([index, new_amount, new_category, new_date, new_type]):
+                    messagebox.showerror(title="Error", message="Please fill out all fields.")
+                    return
 
-        submit_button = tk.Button(summary_window, text="Submit", command=submit_summary)
-        submit_button.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+                # First validate the date before proceeding with update
+                formatted_date = self.format_date(new_date)
+                if not formatted_date:
+                    return  # format_date will handle the error message
 
+                if self.update_transaction(index, new_amount, new_category, new_date, new_type, new_currency or None):
+                    messagebox.showinfo(title="Success", message="Transaction updated successfully.")
+                    update_transaction_window.withdraw()
 
+            index_label = tk.Label(update_transaction_window, text="Transaction Index:")
+            index_label.grid(row=0, column=0, padx=5, pady=5)
 
+            index_entry = tk.Entry(update_transaction_window)
+            index_entry.grid(row=0, column=1, padx=5, pady=5)
 
-    def update_transaction_gui(self):
-        def update_transaction():
-            index = index_entry.get()
-            new_amount = amount_entry.get()
-            new_category = category_var.get()
-            new_date = date_entry.get()
-            new_type = type_var.get()
-
-            if not all([index, new_amount, new_category, new_date, new_type]):
-                messagebox.showerror(title="Error", message="Please fill out all fields.")
-                return
+            amount_label = tk.Label(update_transaction_window, text="New Amount:")
+            amount_label.grid(row=1, column=0, padx=5, pady=5)
 
-            # First validate the date before proceeding with update
-            formatted_date = self.format_date(new_date)
-            if not formatted_date:
-                return  # format_date will handle the error message
+            amount_entry = tk.Entry(update_transaction_window)
+            amount_entry.grid(row=1, column=1, padx=5, pady=5)
 
-            if self.update_transaction(index, new_amount, new_category, new_date, new_type):
-                messagebox.showinfo(title="Success", message="Transaction updated successfully.")
-                update_transaction_window.destroy()
+            category_label = tk.Label(update_transaction_window, text="New Category:")
+            category_label.grid(row=2, column=0, padx=5, pady=5)
 
-        update_transaction_window = tk.Toplevel(self.root)
-        update_transaction_window.title("Update Transaction")
-        update_transaction_window.geometry("1000x1000")
+            category_var = tk.StringVar(update_transaction_window)
+            category_var.set("")
 
-        index_label = tk.Label(update_transaction_window, text="Transaction Index:")
-        index_label.grid(row=0, column=0, padx=5, pady=5)
+            category_dropdown = ttk.Combobox(
+                update_transaction_window,
+                textvariable=category_var,
+                values=list(self.categories),
+                state="readonly"
+            )
+            category_dropdown.grid(row=2, column=1, padx=5, pady=5)
 
-        index_entry = tk.Entry(update_transaction_window)
-        index_entry.grid(row=0, column=1, padx=5, pady=5)
+            date_label = tk.Label(update_transaction_window, text="New Date (YYYY-MM-DD):")
+            date_label.grid(row=3, column=0, padx=5, pady=5)
 
-        amount_label = tk.Label(update_transaction_window, text="New Amount:")
-        amount_label.grid(row=1, column=0, padx=5, pady=5)
+            date_entry = tk.Entry(update_transaction_window)
+            date_entry.grid(row=3, column=1, padx=5, pady=5)
 
-        amount_entry = tk.Entry(update_transaction_window)
-        amount_entry.grid(row=1, column=1, padx=5, pady=5)
+            type_label = tk.Label(update_transaction_window, text="New Type:")
+            type_label.grid(row=4, column=0, padx=5, pady=5)
 
-        category_label = tk.Label(update_transaction_window, text="New Category:")
-        category_label.grid(row=2, column=0, padx=5, pady=5)
+            type_var = tk.StringVar(update_transaction_window)
+            type_var.set("")
 
-        category_var = tk.StringVar(update_transaction_window)
-        category_var.set("")
+            type_dropdown = ttk.Combobox(
+                update_transaction_window,
+                textvariable=type_var,
+                values=["Income", "Expense"],
+                state="readonly"
+            )
+            type_dropdown.grid(row=4, column=1, padx=5, pady=5)
 
-        category_dropdown = ttk.Combobox(
-            update_transaction_window,
-            textvariable=category_var,
-            values=list(self.categories),
-            state="readonly"
-        )
-        category_dropdown.grid(row=2, column=1, padx=5, pady=5)
+            currency_label = tk.Label(update_transaction_window, text="New Currency:")
+            currency_label.grid(row=5, column=0, padx=5, pady=5)
 
-        date_label = tk.Label(update_transaction_window, text="New Date (YYYY-MM-DD):")
-        date_label.grid(row=3, column=0, padx=5, pady=5)
+            currency_var = tk.StringVar(update_transaction_window)
 
-        date_entry = tk.Entry(update_transaction_window)
-        date_entry.grid(row=3, column=1, padx=5, pady=5)
+            currency_dropdown = ttk.Combobox(
+                update_transaction_window,
+                textvariable=currency_var,
+                values=self.get_currencies(),
+                state="readonly"
+            )
+            currency_dropdown.grid(row=5, column=1, padx=5, pady=5)
 
-        type_label = tk.Label(update_transaction_window, text="New Type:")
-        type_label.grid(row=4, column=0, padx=5, pady=5)
+            submit_button = tk.Button(update_transaction_window, text="Submit", command=update_transaction)
+            submit_button.grid(row=6, column=0, columnspan=2, padx=5, pady=5)
 
-        type_var = tk.StringVar(update_transaction_window)
-        type_var.set("")
+            def refresh():
+                for entry in (index_entry, amount_entry, date_entry):
+                    entry.delete(0, tk.END)
+                category_var.set("")
+                type_var.set("")
+                currency_var.set("")
+                category_dropdown.config(values=list(self.categories))
+                currency_dropdown.config(values=self.get_currencies())
 
-        type_dropdown = ttk.Combobox(
-            update_transaction_window,
-            textvariable=type_var,
-            values=["Income", "Expense"],
-            state="readonly"
-        )
-        type_dropdown.grid(row=4, column=1, padx=5, pady=5)
+            return refresh
 
-        submit_button = tk.Button(update_transaction_window, text="Submit", command=update_transaction)
-        submit_button.grid(row=5, column=0, columnspan=2, padx=5, pady=5)
+        self.windows.show("update_transaction", "Update Transaction", build)
 
+    @writes_ledger
     def delete_transaction(self, index):
         try:
             index = int(index)
@@ -630,12 +2687,8 @@ class FinanceTracker:
             for i, transaction in enumerate(self.transactions):
                 if transaction['index'] == index:
                     deleted_transaction = self.transactions.pop(i)
-
-                    # Update the balance based on the deleted transaction
-                    if deleted_transaction['type'] == 'Income':
-                        self.balance -= deleted_transaction['amount']
-                    else:  # Expense
-                        self.balance += deleted_transaction['amount']
+                    self.track_transaction(deleted_transaction, -1)
+                    self.log_operation({'op': 'delete', 'position': i, 'before': dict(deleted_transaction), 'after': None})
 
                     self.save_data()
                     return True
@@ -646,6 +2699,7 @@ class FinanceTracker:
             return False
 
     def delete_transaction_gui(self):
+        def build(delete_transaction_window):
             def delete_transaction():
                 try:
                     index = index_entry.get()
@@ -661,17 +2715,13 @@ class FinanceTracker:
                     success = self.delete_transaction(index)
                     if success:
                         messagebox.showinfo(title="Success", message=f"Transaction {index} deleted successfully.")
-                        delete_transaction_window.destroy()
+                        delete_transaction_window.withdraw()
                     else:
                         messagebox.showerror(title="Error", message="Transaction could not be deleted.")
 
                 except ValueError:
                     messagebox.showerror(title="Error", message="Please enter a valid number for the index.")
 
-            delete_transaction_window = tk.Toplevel(self.root)
-            delete_transaction_window.title("Delete Transaction")
-            delete_transaction_window.geometry("1000x1000")
-
             index_label = tk.Label(delete_transaction_window, text="Transaction Index:")
             index_label.grid(row=0, column=0, padx=5, pady=5)
             index_entry = tk.Entry(delete_transaction_window)
@@ -680,238 +2730,590 @@ class FinanceTracker:
             submit_button = tk.Button(delete_transaction_window, text="Delete", command=delete_transaction)
             submit_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
 
+            def refresh():
+                index_entry.delete(0, tk.END)
+
+            return refresh
+
+        self.windows.show("delete_transaction", "Delete Transaction", build)
+
 
     def search_transactions_gui(self):
-        def search_transactions():
-            category = category_var.get() if category_var.get() != "" else None
-            transaction_type = type_var.get() if type_var.get() != "" else None
+        def build(search_transactions_window):
+            def search_transactions():
+                category = category_var.get() if category_var.get() != "" else None
+                transaction_type = type_var.get() if type_var.get() != "" else None
 
-            try:
-                start_date_obj = None
-                end_date_obj = None
+                try:
+                    start_date_obj = None
+                    end_date_obj = None
 
-                if start_date_entry.get().strip():
-                    start_date_obj = datetime.strptime(start_date_entry.get().strip(), "%Y-%m-%d")
+                    if start_date_entry.get().strip():
+                        start_date_obj = datetime.strptime(start_date_entry.get().strip(), "%Y-%m-%d")
 
-                if end_date_entry.get().strip():
-                    end_date_obj = datetime.strptime(end_date_entry.get().strip(), "%Y-%m-%d")
+                    if end_date_entry.get().strip():
+                        end_date_obj = datetime.strptime(end_date_entry.get().strip(), "%Y-%m-%d")
 
-                if start_date_obj and end_date_obj and start_date_obj > end_date_obj:
-                    messagebox.showerror("Error", "Start date must be before end date")
+                    if start_date_obj and end_date_obj and start_date_obj > end_date_obj:
+                        messagebox.showerror("Error", "Start date must be before end date")
+                        return
+
+                except ValueError:
+                    messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
                     return
 
-                filtered_transactions = self.filter_transactions(
+                self.show_transaction_results(
+                    "search_results",
+                    "Search Results",
+                    "",
+                    approximate=estimate_var.get(),
                     category=category,
                     transaction_type=transaction_type,
                     start_date=start_date_obj,
                     end_date=end_date_obj
                 )
 
-                results_window = tk.Toplevel(self.root)
-                results_window.title("Search Results")
-                results_window.geometry("1000x1000")
-
-                tree = ttk.Treeview(results_window, columns=("Amount", "Category", "Date", "Type", "Source"), show="headings")
-                tree.heading("Amount", text="Amount")
-                tree.heading("Category", text="Category")
-                tree.heading("Date", text="Date")
-                tree.heading("Type", text="Type")
-                tree.heading("Source", text="Source")
-
-                for transaction in filtered_transactions:
-                    tree.insert("", tk.END, values=(
-                        transaction['amount'],
-                        transaction['category'],
-                        transaction['date'],
-                        transaction['type'],
-                        transaction['source']
-                    ))
+            category_label = tk.Label(search_transactions_window, text="Category:")
+            category_label.grid(row=0, column=0, padx=5, pady=5)
 
-                tree.pack()
+            category_var = tk.StringVar(search_transactions_window)
+            category_var.set("")
 
-            except ValueError:
-                messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
-                return
+            category_dropdown = ttk.Combobox(
+                search_transactions_window,
+                textvariable=category_var,
+                values=list(self.categories),
+                state="readonly"
+            )
+            category_dropdown.grid(row=0, column=1, padx=5, pady=5)
 
-        search_transactions_window = tk.Toplevel(self.root)
-        search_transactions_window.title("Search Transactions")
-        search_transactions_window.geometry("1000x1000")
+            type_label = tk.Label(search_transactions_window, text="Type:")
+            type_label.grid(row=1, column=0, padx=5, pady=5)
 
-        category_label = tk.Label(search_transactions_window, text="Category:")
-        category_label.grid(row=0, column=0, padx=5, pady=5)
+            type_var = tk.StringVar(search_transactions_window)
+            type_var.set("")
 
-        category_var = tk.StringVar(search_transactions_window)
-        category_var.set("")
+            type_dropdown = ttk.Combobox(
+                search_transactions_window,
+                textvariable=type_var,
+                values=["Income", "Expense"],
+                state="readonly"
+            )
+            type_dropdown.grid(row=1, column=1, padx=5, pady=5)
 
-        category_dropdown = ttk.Combobox(
-            search_transactions_window,
-            textvariable=category_var,
-            values=list(self.categories),
-            state="readonly"
-        )
-        category_dropdown.grid(row=0, column=1, padx=5, pady=5)
+            start_date_label = tk.Label(search_transactions_window, text="Start Date (YYYY-MM-DD):")
+            start_date_label.grid(row=2, column=0, padx=5, pady=5)
 
-        type_label = tk.Label(search_transactions_window, text="Type:")
-        type_label.grid(row=1, column=0, padx=5, pady=5)
+            start_date_entry = tk.Entry(search_transactions_window)
+            start_date_entry.grid(row=2, column=1, padx=5, pady=5)
 
-        type_var = tk.StringVar(search_transactions_window)
-        type_var.set("")
+            end_date_label = tk.Label(search_transactions_window, text="End Date (YYYY-MM-DD):")
+            end_date_label.grid(row=3, column=0, padx=5, pady=5)
 
-        type_dropdown = ttk.Combobox(
-            search_transactions_window,
-            textvariable=type_var,
-            values=["Income", "Expense"],
-            state="readonly"
-        )
-        type_dropdown.grid(row=1, column=1, padx=5, pady=5)
+            end_date_entry = tk.Entry(search_transactions_window)
+            end_date_entry.grid(row=3, column=1, padx=5, pady=5)
 
-        start_date_label = tk.Label(search_transactions_window, text="Start Date (YYYY-MM-DD):")
-        start_date_label.grid(row=2, column=0, padx=5, pady=5)
+            estimate_var = tk.BooleanVar(search_transactions_window, value=True)
+            estimate_check = tk.Checkbutton(search_transactions_window, text="Show a quick estimate first", variable=estimate_var)
+            estimate_check.grid(row=4, column=0, columnspan=2, padx=5, pady=5)
 
-        start_date_entry = tk.Entry(search_transactions_window)
-        start_date_entry.grid(row=2, column=1, padx=5, pady=5)
+            submit_button = tk.Button(search_transactions_window, text="Search", command=search_transactions)
+            submit_button.grid(row=5, column=0, columnspan=2, padx=5, pady=5)
 
-        end_date_label = tk.Label(search_transactions_window, text="End Date (YYYY-MM-DD):")
-        end_date_label.grid(row=3, column=0, padx=5, pady=5)
+            def refresh():
+                # Keep the last search filled in, only the category list can go stale
+                category_dropdown.config(values=list(self.categories))
 
-        end_date_entry = tk.Entry(search_transactions_window)
-        end_date_entry.grid(row=3, column=1, padx=5, pady=5)
+            return refresh
 
-        submit_button = tk.Button(search_transactions_window, text="Search", command=search_transactions)
-        submit_button.grid(row=4, column=0, columnspan=2, padx=5, pady=5)
-        
+        self.windows.show("search_transactions", "Search Transactions", build)
 
 
     def add_category_gui(self):
-        def submit_category():
-            category_name = category_entry.get()
-            if not category_name:
-                messagebox.showerror(title="Error", message="Please enter a category name.")
-                return
-            self.add_category(category_name)
-            messagebox.showinfo(title="Success", message="Category added successfully.")
-            add_category_window.destroy()
+        def build(add_category_window):
+            def submit_category():
+                category_name = category_entry.get()
+                if not category_name:
+                    messagebox.showerror(title="Error", message="Please enter a category name.")
+                    return
+                if not self.add_category(category_name):
+                    return
+                messagebox.showinfo(title="Success", message="Category added successfully.")
+                add_category_window.withdraw()
 
 
-        add_category_window = tk.Toplevel(self.root)
-        add_category_window.title("Add Category")
-        add_category_window.geometry("1000x1000")
+            category_label = tk.Label(add_category_window, text="Category Name:")
+            category_label.grid(row=0, column=0, padx=5, pady=5)
+            category_entry = tk.Entry(add_category_window)
+            category_entry.grid(row=0, column=1, padx=5, pady=5)
 
 
-        category_label = tk.Label(add_category_window, text="Category Name:")
-        category_label.grid(row=0, column=0, padx=5, pady=5)
-        category_entry = tk.Entry(add_category_window)
-        category_entry.grid(row=0, column=1, padx=5, pady=5)
+            submit_button = tk.Button(add_category_window, text="Submit", command=submit_category)
+            submit_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+
+            def refresh():
+                category_entry.delete(0, tk.END)
 
+            return refresh
 
-        submit_button = tk.Button(add_category_window, text="Submit", command=submit_category)
-        submit_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+        self.windows.show("add_category", "Add Category", build)
 
 
     def remove_category_gui(self):
-        def remove_category():
-            category_name = category_var.get()
-            if not category_name:
-                messagebox.showerror(title="Error", message="Please select a category to remove.")
-                return
-            self.remove_category(category_name)
-            messagebox.showinfo(title="Success", message="Category removed successfully.")
-            remove_category_window.destroy()
+        def build(remove_category_window):
+            def remove_category():
+                category_name = category_var.get()
+                if not category_name:
+                    messagebox.showerror(title="Error", message="Please select a category to remove.")
+                    return
+                self.remove_category(category_name)
+                messagebox.showinfo(title="Success", message="Category removed successfully.")
+                remove_category_window.withdraw()
 
 
-        remove_category_window = tk.Toplevel(self.root)
-        remove_category_window.title("Remove Category")
-        remove_category_window.geometry("1000x1000")
+            category_label = tk.Label(remove_category_window, text="Category:")
+            category_label.grid(row=0, column=0, padx=5, pady=5)
+            category_var = tk.StringVar(remove_category_window)
+            category_var.set("")
+            category_dropdown = ttk.Combobox(
+                remove_category_window,
+                textvariable=category_var,
+                values=list(self.categories),
+                state="readonly"
+            )
+            category_dropdown.grid(row=0, column=1, padx=5, pady=5)
 
 
-        category_label = tk.Label(remove_category_window, text="Category:")
-        category_label.grid(row=0, column=0, padx=5, pady=5)
-        category_var = tk.StringVar(remove_category_window)
-        category_var.set("")
-        category_dropdown = ttk.Combobox(
-            remove_category_window,
-            textvariable=category_var,
-            values=list(self.categories),
-            state="readonly"
-        )
-        category_dropdown.grid(row=0, column=1, padx=5, pady=5)
+            submit_button = tk.Button(remove_category_window, text="Remove", command=remove_category)
+            submit_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
 
+            def refresh():
+                category_var.set("")
+                category_dropdown.config(values=list(self.categories))
 
-        submit_button = tk.Button(remove_category_window, text="Remove", command=remove_category)
-        submit_button.grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+            return refresh
 
+        self.windows.show("remove_category", "Remove Category", build)
+
+
+    def export_gui(self):
+        def build(export_window):
+            export_kinds = ["Transactions", "Weekly Report", "Monthly Report", "Custom Range Report"]
+            format_names = {name: file_format for file_format, name in EXPORT_FORMATS.items()}
+
+            def submit_export():
+                kind = kind_var.get()
+                file_format = format_names.get(format_var.get())
+
+                if not kind or not file_format:
+                    messagebox.showerror(title="Error", message="Please choose what to export and a format.")
+                    return
+
+                try:
+                    start_date_obj = None
+                    end_date_obj = None
+
+                    if start_date_entry.get().strip():
+                        start_date_obj = datetime.strptime(start_date_entry.get().strip(), "%Y-%m-%d")
+
+                    if end_date_entry.get().strip():
+                        end_date_obj = datetime.strptime(end_date_entry.get().strip(), "%Y-%m-%d")
+                except ValueError:
+                    messagebox.showerror("Error", "Invalid date format. Please use YYYY-MM-DD")
+                    return
+
+                if start_date_obj and end_date_obj and start_date_obj > end_date_obj:
+                    messagebox.showerror("Error", "Start date must be before end date")
+                    return
+
+                if kind == "Custom Range Report" and not (start_date_obj and end_date_obj):
+                    messagebox.showerror(title="Error", message="Please fill in both start and end dates.")
+                    return
+
+                columns = [column for column in TRANSACTION_COLUMNS if column_vars[column].get()]
+                if kind == "Transactions" and not columns:
+                    messagebox.showerror(title="Error", message="Please select at least one column.")
+                    return
+
+                file_path = filedialog.asksaveasfilename(
+                    parent=export_window,
+                    defaultextension=f".{file_format}",
+                    filetypes=[(EXPORT_FORMATS[file_format], f"*.{file_format}")]
+                )
+                if not file_path:
+                    return
+
+                try:
+                    if kind == "Transactions":
+                        exported = self.export_transactions(
+                            file_path,
+                            file_format,
+                            columns=columns,
+                            category=category_var.get() or None,
+                            transaction_type=type_var.get() or None,
+                            start_date=start_date_obj,
+                            end_date=end_date_obj
+                        )
+                    elif kind == "Custom Range Report":
+                        exported = self.export_report(file_path, file_format, start_date_obj, end_date_obj)
+                    else:
+                        start_date_obj, end_date_obj = self.get_report_period('weekly' if kind == "Weekly Report" else 'monthly')
+                        exported = self.export_report(file_path, file_format, start_date_obj, end_date_obj)
+                except (OSError, ValueError) as e:
+                    # An unwritable target or a missing exchange rate for a report
+                    messagebox.showerror("Error", f"An error occurred: {e}")
+                    return
+
+                if exported:
+                    messagebox.showinfo(title="Success", message=f"Exported to {file_path}.")
+
+
+            kind_label = tk.Label(export_window, text="Export:")
+            kind_label.grid(row=0, column=0, padx=5, pady=5)
+
+            kind_var = tk.StringVar(export_window)
+            kind_var.set("Transactions")
+
+            kind_dropdown = ttk.Combobox(export_window, textvariable=kind_var, values=export_kinds, state="readonly")
+            kind_dropdown.grid(row=0, column=1, padx=5, pady=5)
+
+            format_label = tk.Label(export_window, text="Format:")
+            format_label.grid(row=1, column=0, padx=5, pady=5)
+
+            format_var = tk.StringVar(export_window)
+            format_var.set(EXPORT_FORMATS['csv'])
+
+            format_dropdown = ttk.Combobox(export_window, textvariable=format_var, values=list(EXPORT_FORMATS.values()), state="readonly")
+            format_dropdown.grid(row=1, column=1, padx=5, pady=5)
+
+            category_label = tk.Label(export_window, text="Category:")
+            category_label.grid(row=2, column=0, padx=5, pady=5)
+
+            category_var = tk.StringVar(export_window)
+            category_var.set("")
+
+            category_dropdown = ttk.Combobox(export_window, textvariable=category_var, values=list(self.categories), state="readonly")
+            category_dropdown.grid(row=2, column=1, padx=5, pady=5)
+
+            type_label = tk.Label(export_window, text="Type:")
+            type_label.grid(row=3, column=0, padx=5, pady=5)
+
+            type_var = tk.StringVar(export_window)
+            type_var.set("")
+
+            type_dropdown = ttk.Combobox(export_window, textvariable=type_var, values=["Income", "Expense"], state="readonly")
+            type_dropdown.grid(row=3, column=1, padx=5, pady=5)
+
+            start_date_label = tk.Label(export_window, text="Start Date (YYYY-MM-DD):")
+            start_date_label.grid(row=4, column=0, padx=5, pady=5)
+
+            start_date_entry = tk.Entry(export_window)
+            start_date_entry.grid(row=4, column=1, padx=5, pady=5)
+
+            end_date_label = tk.Label(export_window, text="End Date (YYYY-MM-DD):")
+            end_date_label.grid(row=5, column=0, padx=5, pady=5)
+
+            end_date_entry = tk.Entry(export_window)
+            end_date_entry.grid(row=5, column=1, padx=5, pady=5)
+
+            columns_label = tk.Label(export_window, text="Columns:")
+            columns_label.grid(row=6, column=0, padx=5, pady=5)
+
+            columns_frame = tk.Frame(export_window)
+            columns_frame.grid(row=6, column=1, padx=5, pady=5)
+
+            column_vars = {}
+            for column in TRANSACTION_COLUMNS:
+                column_vars[column] = tk.BooleanVar(export_window, value=True)
+                tk.Checkbutton(columns_frame, text=column, variable=column_vars[column]).pack(side='left')
+
+            submit_button = tk.Button(export_window, text="Export", command=submit_export)
+            submit_button.grid(row=7, column=0, columnspan=2, padx=5, pady=5)
+
+            def refresh():
+                category_dropdown.config(values=list(self.categories))
+
+            return refresh
+
+        self.windows.show("export", "Export", build)
 
-    def transaction_maintenance_menu(self):
-        transaction_maintenance_window = tk.Toplevel(self.root)
-        transaction_maintenance_window.title("Transaction Maintenance")
-        transaction_maintenance_window.geometry("1000x1000")
 
+    def history_gui(self, page_size=100):
+        def build(history_window):
+            def describe(values):
+                if values is None:
+                    return ""
+                return f"{values['amount']} | {values['category']} | {values['date']} | {values['type']} | {values['source']}"
 
-        add_button = tk.Button(transaction_maintenance_window, text="Add Transaction", command=self.add_transaction_gui)
-        add_button.pack(pady=5)
+            def show_page(page_number):
+                # Pages are pulled from the log only when first requested
+                while len(pages) <= page_number:
+                    page = []
+                    for entry in history:
+                        page.append(entry)
+                        if len(page) == page_size:
+                            break
+                    if not page:
+                        return
+                    pages.append(page)
+
+                current_page[0] = page_number
+                tree.delete(*tree.get_children())
+                for entry in pages[page_number]:
+                    if entry['op'] in ('add_category', 'remove_category'):
+                        before, after = "", entry['category']
+                    elif entry['op'] in ('add_rule', 'remove_rule'):
+                        rule = entry['rule']
+                        description = f"{rule['keyword']} | {rule['min_amount']} - {rule['max_amount']} -> {rule['category']}"
+                        before, after = (description, "") if entry['op'] == 'remove_rule' else ("", description)
+                    elif entry['op'] == 'set_budget':
+                        before = "" if entry['before'] is None else f"{entry['category']} | {entry['before']}"
+                        after = "" if entry['after'] is None else f"{entry['category']} | {entry['after']}"
+                    else:
+                        before, after = describe(entry['before']), describe(entry['after'])
+                    operation = entry['op'] if 'reason' not in entry else f"{entry['op']} ({entry['reason']})"
+                    tree.insert("", tk.END, values=(
+                        entry['timestamp'],
+                        entry['user'],
+                        operation,
+                        before,
+                        after
+                    ))
+                page_label.config(text=f"Page {page_number + 1}")
+
+            history = None
+            pages = []
+            current_page = [0]
+
+            frame = tk.Frame(history_window)
+            frame.pack(fill='both', expand=True)
+
+            tree = ttk.Treeview(frame, columns=("Time", "User", "Operation", "Before", "After"), show="headings")
+            tree.heading("Time", text="Time")
+            tree.heading("User", text="User")
+            tree.heading("Operation", text="Operation")
+            tree.heading("Before", text="Before")
+            tree.heading("After", text="After")
+            tree.pack(fill='both', expand=True)
+
+            navigation_frame = tk.Frame(history_window)
+            navigation_frame.pack(pady=5)
+
+            newer_button = tk.Button(navigation_frame, text="Newer", command=lambda: show_page(max(current_page[0] - 1, 0)))
+            newer_button.pack(side='left', padx=5)
+
+            page_label = tk.Label(navigation_frame, text="Page 1")
+            page_label.pack(side='left', padx=5)
+
+            older_button = tk.Button(navigation_frame, text="Older", command=lambda: show_page(current_page[0] + 1))
+            older_button.pack(side='left', padx=5)
+
+            def refresh():
+                # Start over from the newest entry, older pages are read again on demand
+                nonlocal history
+                history = self.iter_operation_history()
+                pages.clear()
+                tree.delete(*tree.get_children())
+                show_page(0)
+
+            return refresh
+
+        self.windows.show("history", "History", build, live=True)
 
 
-        delete_button = tk.Button(transaction_maintenance_window, text="Delete Transaction", command=self.delete_transaction_gui)
-        delete_button.pack(pady=5)
+    def transaction_maintenance_menu(self):
+        def build(transaction_maintenance_window):
+            add_button = tk.Button(transaction_maintenance_window, text="Add Transaction", command=self.add_transaction_gui)
+            add_button.pack(pady=5)
+
+
+            delete_button = tk.Button(transaction_maintenance_window, text="Delete Transaction", command=self.delete_transaction_gui)
+            delete_button.pack(pady=5)
+
 
+            modify_button = tk.Button(transaction_maintenance_window, text="Update Transaction", command=self.update_transaction_gui)
+            modify_button.pack(pady=5)
 
-        modify_button = tk.Button(transaction_maintenance_window, text="Update Transaction", command=self.update_transaction_gui)
-        modify_button.pack(pady=5)
 
+            duplicates_button = tk.Button(transaction_maintenance_window, text="Review Duplicates", command=self.review_duplicates_gui)
+            duplicates_button.pack(pady=5)
 
+        self.windows.show("transaction_maintenance", "Transaction Maintenance", build)
 
 
     def reports_menu(self):
-        reports_window = tk.Toplevel(self.root)
-        reports_window.title("Reports")
-        reports_window.geometry("1000x1000")
+        def build(reports_window):
+            summary_button = tk.Button(reports_window, text="Choose Dates", command=self.generate_summary_gui)
+            summary_button.pack(pady=5)
 
 
-        summary_button = tk.Button(reports_window, text="Choose Dates", command=self.generate_summary_gui)
-        summary_button.pack(pady=5)
+            weekly_button = tk.Button(reports_window, text="Weekly Report", command=self.get_weekly_summary)
+            weekly_button.pack(pady=5)
 
 
-        weekly_button = tk.Button(reports_window, text="Weekly Report", command=self.get_weekly_summary)
-        weekly_button.pack(pady=5)
+            monthly_button = tk.Button(reports_window, text="Monthly Report", command=self.get_monthly_summary)
+            monthly_button.pack(pady=5)
 
 
-        monthly_button = tk.Button(reports_window, text="Monthly Report", command=self.get_monthly_summary)
-        monthly_button.pack(pady=5)
+            current_balance_button = tk.Button(reports_window, text="Current Balance", command=self.view_balance_gui)
+            current_balance_button.pack(pady=5)
 
 
-        current_balance_button = tk.Button(reports_window, text="Current Balance", command=self.view_balance_gui)
-        current_balance_button.pack(pady=5)
+            budget_status_button = tk.Button(reports_window, text="Budget Status", command=self.view_budgets_gui)
+            budget_status_button.pack(pady=5)
+
+        self.windows.show("reports", "Reports", build)
 
 
     def category_maintenance_menu(self):
-        category_maintenance_window = tk.Toplevel(self.root)
-        category_maintenance_window.title("Category Maintenance")
-        category_maintenance_window.geometry("1000x1000")
+        def build(category_maintenance_window):
+            add_button = tk.Button(category_maintenance_window, text="Add Category", command=self.add_category_gui)
+            add_button.pack(pady=5)
+
+
+            remove_button = tk.Button(category_maintenance_window, text="Remove Category", command=self.remove_category_gui)
+            remove_button.pack(pady=5)
+
 
+            budget_button = tk.Button(category_maintenance_window, text="Set Budget", command=self.set_budget_gui)
+            budget_button.pack(pady=5)
 
-        add_button = tk.Button(category_maintenance_window, text="Add Category", command=self.add_category_gui)
-        add_button.pack(pady=5)
 
+            rules_button = tk.Button(category_maintenance_window, text="Categorization Rules", command=self.rules_gui)
+            rules_button.pack(pady=5)
+
+        self.windows.show("category_maintenance", "Category Maintenance", build)
 
-        remove_button = tk.Button(category_maintenance_window, text="Remove Category", command=self.remove_category_gui)
-        remove_button.pack(pady=5)
 
     def filter_transactions(self, category=None, transaction_type=None, start_date=None, end_date=None):
-        filtered = self.transactions.copy()
+        return list(self.iter_transactions(category, transaction_type, start_date, end_date))
+
+
+    def iter_transactions(self, category=None, transaction_type=None, start_date=None, end_date=None, transactions=None):
+        # Lazy version of filter_transactions, used where the result is streamed
+        for t in self.transactions if transactions is None else transactions:
+            if category and t['category'] != category:
+                continue
+            if transaction_type and t['type'] != transaction_type:
+                continue
+            if start_date or end_date:
+                if not t['date']:
+                    continue
+                transaction_date = datetime.strptime(t['date'], "%Y-%m-%d")
+                if start_date and transaction_date < start_date:
+                    continue
+                if end_date and transaction_date > end_date:
+                    continue
+            yield t
+
+
+    def estimate_transactions(self, category=None, transaction_type=None, start_date=None, end_date=None):
+        # Answered from the running sample and sketches, the transactions themselves are never scanned
+        as_of = (end_date or datetime.now()).strftime("%Y-%m-%d")
+        memo = {}
+        return self.ledger_sample.estimate(
+            lambda amount, currency: self.convert_totals({currency: amount}, as_of, memo),
+            category, transaction_type, start_date, end_date
+        )
+
+
+    def snapshot(self, rows=True):
+        # Detached read-only copy of the ledger for readers running alongside the writer.
+        # Without rows it only answers from the running totals.
+        if self.exchange_rates is None:
+            self.load_exchange_rates()
+        snapshot = FinanceTracker.__new__(FinanceTracker)
+        snapshot.root = None
+        snapshot.transactions = self.transactions.detached() if rows else None
+        snapshot.categories = set(self.categories)
+        snapshot.base_currency = self.base_currency
+        snapshot.balances = dict(self.balances)
+        snapshot.exchange_rates = self.exchange_rates
+        snapshot.budgets = dict(self.budgets)
+        snapshot.budget_usage = dict(self.budget_usage)
+        snapshot.daily_totals = {day: dict(totals) for day, totals in self.daily_totals.items()}
+        return snapshot
+
+
+    def iter_report_rows(self, start_date, end_date):
+        total_income, total_expenses, income_by_category, expenses_by_category = self.calculate_report(start_date, end_date)
+
+        yield {'section': 'SUMMARY', 'category': 'TOTAL INCOME', 'amount': round(total_income, 2)}
+        yield {'section': 'SUMMARY', 'category': 'TOTAL EXPENSES', 'amount': round(total_expenses, 2)}
+        yield {'section': 'SUMMARY', 'category': 'NET BALANCE', 'amount': round(total_income - total_expenses, 2)}
+        for category in sorted(self.categories):
+            yield {'section': 'INCOME', 'category': category, 'amount': round(income_by_category[category], 2)}
+        for category in sorted(self.categories):
+            yield {'section': 'EXPENSE', 'category': category, 'amount': round(expenses_by_category[category], 2)}
+
+
+    def iter_export_chunks(self, rows, columns, chunk_size=EXPORT_CHUNK_SIZE):
+        # Only the projected fields are read from each row, and at most one
+        # chunk of tuples is held at a time.
+        chunk = []
+        for row in rows:
+            chunk.append(tuple(row.get(column) for column in columns))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+    def export_rows(self, rows, file_path, file_format, columns, chunk_size=EXPORT_CHUNK_SIZE):
+        if file_format not in EXPORT_FORMATS:
+            self.show_error(title="Error", message=f"Unsupported export format '{file_format}'.")
+            return False
+
+        chunks = self.iter_export_chunks(rows, columns, chunk_size)
+
+        if file_format == 'csv':
+            with open(file_path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                for chunk in chunks:
+                    writer.writerows(chunk)
+
+        elif file_format == 'jsonl':
+            with open(file_path, 'w') as file:
+                for chunk in chunks:
+                    file.write(''.join(json.dumps(dict(zip(columns, values))) + '\n' for values in chunk))
 
-        if category:
-            filtered = [t for t in filtered if t['category'] == category]
+        elif file_format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                self.show_error(title="Error", message="Parquet export requires the 'pyarrow' package.")
+                return False
+
+            schema = pa.schema([(column, getattr(pa, EXPORT_PARQUET_TYPES.get(column, 'string'))()) for column in columns])
+            with pq.ParquetWriter(file_path, schema) as writer:
+                for chunk in chunks:
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(list(values), type=field.type) for values, field in zip(zip(*chunk), schema)],
+                        schema=schema
+                    ))
+
+        return True
+
+
+    def export_transactions(self, file_path, file_format, columns=None, category=None, transaction_type=None, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+        rows = self.iter_transactions(category, transaction_type, start_date, end_date)
+        return self.export_rows(rows, file_path, file_format, columns or TRANSACTION_COLUMNS, chunk_size)
 
-        if transaction_type:
-            filtered = [t for t in filtered if t['type'] == transaction_type]
 
-        if start_date:
-            filtered = [t for t in filtered if t['date'] and datetime.strptime(t['date'], "%Y-%m-%d") >= start_date]
+    def export_report(self, file_path, file_format, start_date, end_date):
+        return self.export_rows(self.iter_report_rows(start_date, end_date), file_path, file_format, REPORT_COLUMNS)
 
-        if end_date:
-            filtered = [t for t in filtered if t['date'] and datetime.strptime(t['date'], "%Y-%m-%d") <= end_date]
 
-        return filtered
+    def ledger_shortcut(self, action):
+        def handler(event):
+            # In a text field Ctrl+Z/Ctrl+Y edit the text, not the ledger
+            if isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Spinbox, tk.Text)):
+                return
+            action()
+        return handler
 
 
     def run(self):
@@ -923,7 +3325,21 @@ class FinanceTracker:
         # Create the "File" menu
         filemenu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="App", menu=filemenu)
-        filemenu.add_command(label="Exit", command=self.root.quit)
+        filemenu.add_command(label="Import CSV...", command=self.import_transactions_gui)
+        filemenu.add_command(label="Export...", command=self.export_gui)
+        filemenu.add_command(label="Load Exchange Rates...", command=self.load_exchange_rates_gui)
+        filemenu.add_command(label="Row Cache Statistics", command=self.row_cache_gui)
+        filemenu.add_command(label="Exit", command=self.close)
+
+
+        # Create the "Edit" menu
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo)
+        edit_menu.add_command(label="History", command=self.history_gui)
+        self.root.bind_all("<Control-z>", self.ledger_shortcut(self.undo))
+        self.root.bind_all("<Control-y>", self.ledger_shortcut(self.redo))
 
 
         # Create the "Transactions" menu
@@ -931,6 +3347,7 @@ class FinanceTracker:
         menubar.add_cascade(label="Transactions", menu=transactions_menu)
         transactions_menu.add_command(label="Transaction Maintenance", command=self.transaction_maintenance_menu)
         transactions_menu.add_command(label="Search Transactions", command=self.search_transactions_gui) #Directly call search_transactions_gui
+        transactions_menu.add_command(label="Review Duplicates", command=self.review_duplicates_gui)
 
 
         # Create the "Reports" menu
@@ -940,20 +3357,347 @@ class FinanceTracker:
         reports_menu.add_command(label="Weekly Report", command=self.get_weekly_summary)
         reports_menu.add_command(label="Monthly Report", command=self.get_monthly_summary)
         reports_menu.add_command(label="Current Balance", command=self.view_balance_gui)
+        reports_menu.add_command(label="Budget Status", command=self.view_budgets_gui)
 
 
         # Create the "Categories" menu
         categories_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Categories", menu=categories_menu)
         categories_menu.add_command(label="Category Maintenance", command=self.category_maintenance_menu)
+        categories_menu.add_command(label="Set Budget", command=self.set_budget_gui)
+        categories_menu.add_command(label="Categorization Rules", command=self.rules_gui)
 
 
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.after(LEDGER_POLL_INTERVAL_MS, self.watch_ledger)
         self.root.mainloop()
 
 
+    def watch_ledger(self):
+        # Poll for writes made by other instances (there is no portable file
+        # notification API in the standard library) and replay only the delta.
+        self.refresh_from_disk()
+        self.root.after(LEDGER_POLL_INTERVAL_MS, self.watch_ledger)
+
+
+class LedgerServer:
+    """Local HTTP/JSON API over a headless FinanceTracker.
+
+    Only a single writer thread touches the tracker. It applies writes in
+    order and after every committed one publishes a fresh snapshot, version
+    and Last-Modified by swapping one reference, so reads answered in worker
+    threads from the published snapshot never wait on a write. Snapshots
+    carry the running totals only; the rows are copied on the writer thread
+    the first time a read needs them and shared until the next write.
+    """
+
+    def __init__(self, tracker, host='127.0.0.1', port=8765, page_size=100):
+        self.tracker = tracker
+        self.host = host
+        self.port = port
+        self.page_size = page_size
+        self.started = int(time.time())
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ledger-writer')
+        # (version, last modified, snapshot), replaced whole by the writer thread
+        self.published = None
+
+
+    def etag(self, version, day=None):
+        return f'"{self.started}-{version}-{day}"' if day else f'"{self.started}-{version}"'
+
+
+    def publish(self, version, last_modified, rows=False):
+        # Writer thread only, where the tracker is at exactly this version
+        self.published = (version, last_modified, self.tracker.snapshot(rows=rows))
+        return self.published
+
+
+    def commit(self, action):
+        # Writer thread only
+        self.tracker.last_error = None
+        self.tracker.last_warning = None
+        try:
+            result = action()
+        except Exception as e:
+            result = e
+        version, last_modified, _ = self.published
+        if result is True:
+            version += 1
+            # Whole seconds as sent in Last-Modified, moved on even for a second write within one second
+            self.publish(version, max(int(time.time()), last_modified + 1))
+        return result, self.tracker.last_error, self.tracker.last_warning, version
+
+
+    def with_rows(self):
+        # Writer thread only, so no write can land between the published version and the copied rows
+        version, last_modified, snapshot = self.published
+        if snapshot.transactions is None:
+            return self.publish(version, last_modified, rows=True)
+        return self.published
+
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.writer, self.publish, 0, int(time.time()))
+        watcher_task = asyncio.create_task(self._watch_ledger())
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher_task.cancel()
+            self.writer.shutdown(wait=False)
+
+
+    async def _watch_ledger(self):
+        # Changes made by other instances go through the writer like any other write
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(LEDGER_POLL_INTERVAL_MS / 1000)
+            await loop.run_in_executor(self.writer, self.commit, self.tracker.refresh_from_disk)
+
+
+    async def _write(self, action):
+        result, error, warning, version = await asyncio.get_running_loop().run_in_executor(self.writer, self.commit, action)
+
+        if isinstance(result, Exception):
+            # The details go to the server's stderr, not to the client
+            traceback.print_exception(type(result), result, result.__traceback__)
+            return 500, {'error': "The request failed on the server."}
+        if result is not True:
+            return 400, {'error': error or "Request could not be applied."}
+        response = {'ok': True, 'version': version}
+        if warning:
+            response['warning'] = warning
+        return 200, response
+
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            try:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = b''
+                if int(headers.get('content-length', 0)) > 0:
+                    body = await reader.readexactly(int(headers['content-length']))
+
+                status, payload, extra_headers = await self.dispatch(method, target, headers, body)
+            except (ValueError, KeyError) as e:
+                status, payload, extra_headers = 400, {'error': f"Malformed request: {e}"}, {}
+            except Exception:
+                # Whatever went wrong, the client still gets an answer
+                traceback.print_exc()
+                status, payload, extra_headers = 500, {'error': "The request failed on the server."}, {}
+
+            self._send(writer, status, payload, extra_headers)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+    def _send(self, writer, status, payload, extra_headers):
+        reasons = {200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request",
+                   404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+        body = b'' if status == 304 else json.dumps(payload).encode()
+        lines = [f"HTTP/1.1 {status} {reasons.get(status, '')}"]
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(body)), 'Connection': 'close'}
+        headers.update(extra_headers)
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+
+    def _not_modified(self, headers, etag, last_modified):
+        if 'if-none-match' in headers:
+            return etag in [tag.strip() for tag in headers['if-none-match'].split(',')]
+        if 'if-modified-since' in headers:
+            try:
+                since = parsedate_to_datetime(headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return last_modified <= since
+        return False
+
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.split('/') if part]
+
+        if method == 'GET':
+            version, last_modified, snapshot = self.published
+            day = None
+            if parts in (['reports', 'weekly'], ['reports', 'monthly']):
+                # These periods end today, so they change at midnight as well as on writes
+                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                day = today.strftime("%Y-%m-%d")
+                last_modified = max(last_modified, int(today.timestamp()))
+            if self._not_modified(headers, self.etag(version, day), last_modified):
+                return 304, None, {'ETag': self.etag(version, day)}
+
+            handlers = {
+                ('balance',): self.read_balance,
+                ('categories',): self.read_categories,
+                ('transactions',): self.read_transactions,
+                ('reports', 'summary'): self.read_summary,
+                ('reports', 'weekly'): self.read_summary,
+                ('reports', 'monthly'): self.read_summary,
+            }
+            handler = handlers.get(tuple(parts))
+            if handler is None:
+                return 404, {'error': "Not found."}, {}
+
+            if parts[0] == 'reports':
+                query['period'] = parts[1]
+
+            loop = asyncio.get_running_loop()
+            if handler == self.read_transactions and snapshot.transactions is None:
+                version, last_modified, snapshot = await loop.run_in_executor(self.writer, self.with_rows)
+
+            # The snapshot is never mutated, so any number of reads can run on it at once
+            status, payload = await loop.run_in_executor(None, handler, snapshot, query)
+            return status, payload, {
+                'ETag': self.etag(version, day),
+                'Last-Modified': formatdate(last_modified, usegmt=True)
+            }
+
+        data = json.loads(body) if body else {}
+        if not isinstance(data, dict):
+            return 400, {'error': "Request body must be a JSON object."}, {}
+        for name in ('category', 'date', 'type', 'source', 'currency', 'name'):
+            if data.get(name) is not None and not isinstance(data[name], str):
+                return 400, {'error': f"{name} must be a string."}, {}
+        tracker = self.tracker
+
+        if method == 'POST' and parts == ['transactions']:
+            missing = [name for name in ('amount', 'category', 'date', 'type') if data.get(name) in (None, '')]
+            if missing:
+                return 400, {'error': f"Missing required fields: {', '.join(missing)}."}, {}
+            status, payload = await self._write(lambda: tracker.add_transaction(
+                data.get('amount'), data.get('category'), data.get('date'), data.get('type'), data.get('source', ''),
+                data.get('currency')
+            ))
+            return (201 if status == 200 else status), payload, {}
+
+        if method in ('PATCH', 'DELETE') and len(parts) == 2 and parts[0] == 'transactions':
+            index = int(parts[1])
+
+            def position_of():
+                for position, transaction in enumerate(tracker.transactions):
+                    if transaction['index'] == index:
+                        return position
+                tracker.last_error = "This transaction index does not exist."
+                return None
+
+            if method == 'DELETE':
+                return (*await self._write(lambda: position_of() is not None and tracker.delete_transaction(index)), {})
+
+            def update():
+                position = position_of()
+                if position is None:
+                    return False
+                return tracker.update_transaction(
+                    position,
+                    data.get('amount'), data.get('category'), data.get('date'), data.get('type'),
+                    data.get('currency')
+                )
+
+            return (*await self._write(update), {})
+
+        if method == 'POST' and parts == ['categories']:
+            if not (data.get('name') or '').strip():
+                return 400, {'error': "Missing required field: name."}, {}
+            return (*await self._write(lambda: tracker.add_category(data.get('name'))), {})
+
+        if method == 'DELETE' and len(parts) == 2 and parts[0] == 'categories':
+            return (*await self._write(lambda: tracker.remove_category(parts[1])), {})
+
+        return 405, {'error': "Method not allowed."}, {}
+
+
+    def read_balance(self, snapshot, query):
+        return 200, {
+            'balance': round(snapshot.get_balance_in_base(), 2),
+            'currency': snapshot.base_currency,
+            'balances': {currency: round(amount, 2) for currency, amount in snapshot.balances.items()}
+        }
+
+
+    def read_categories(self, snapshot, query):
+        return 200, {'categories': sorted(snapshot.categories)}
+
+
+    def read_transactions(self, snapshot, query):
+        offset = max(int(query.get('offset', 0)), 0)
+        limit = min(max(int(query.get('limit', self.page_size)), 1), 1000)
+        matches = snapshot.iter_transactions(
+            category=query.get('category'),
+            transaction_type=query.get('type'),
+            start_date=self._parse_date(query.get('start')),
+            end_date=self._parse_date(query.get('end'))
+        )
+
+        page = []
+        total = 0
+        for transaction in matches:
+            if offset <= total < offset + limit:
+                page.append(transaction)
+            total += 1
+
+        return 200, {'total': total, 'offset': offset, 'limit': limit, 'transactions': page}
+
+
+    def read_summary(self, snapshot, query):
+        if query['period'] == 'summary':
+            start_date = self._parse_date(query.get('start'))
+            end_date = self._parse_date(query.get('end'))
+            if not start_date or not end_date:
+                return 400, {'error': "Please provide both start and end dates."}
+        else:
+            start_date, end_date = snapshot.get_report_period(query['period'])
+
+        total_income, total_expenses, income_by_category, expenses_by_category = snapshot.calculate_report(start_date, end_date)
+        return 200, {
+            'start': start_date.strftime("%Y-%m-%d"),
+            'end': end_date.strftime("%Y-%m-%d"),
+            'total_income': round(total_income, 2),
+            'total_expenses': round(total_expenses, 2),
+            'net_balance': round(total_income - total_expenses, 2),
+            'income_by_category': {category: round(amount, 2) for category, amount in income_by_category.items()},
+            'expenses_by_category': {category: round(amount, 2) for category, amount in expenses_by_category.items()}
+        }
+
+
+    def _parse_date(self, value):
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
 
 if __name__ == '__main__':
-    app = FinanceTracker()
-    app.run()
+    parser = argparse.ArgumentParser(description="Finance Tracker")
+    parser.add_argument('--serve', action='store_true', help="run the local HTTP/JSON API instead of the GUI")
+    parser.add_argument('--port', type=int, default=8765, help="port for --serve (always bound to 127.0.0.1)")
+    parser.add_argument('--row-cache', type=int, metavar='ROWS', help="keep at most ROWS transactions in memory and page the rest from disk")
+    args = parser.parse_args()
+
+    if args.serve:
+        server = LedgerServer(FinanceTracker(gui=False, row_cache_size=args.row_cache), port=args.port)
+        print(f"Serving on http://127.0.0.1:{args.port}")
+        asyncio.run(server.serve())
+    else:
+        app = FinanceTracker(row_cache_size=args.row_cache)
+        app.run()
 
 